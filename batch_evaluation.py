@@ -0,0 +1,124 @@
+from pieces import piece_types, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from evaluation import material_scores, square_scores
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# leaf positions are encoded as 64 bytes of piece code + 1 (0 is an empty square) and the side to move
+encoding_size = 65
+mobility_weight = 4
+# under this many positions the per-call cost of numpy outweighs the vectorised work
+numpy_batch_minimum = 16
+orthogonal_directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+diagonal_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def _leaper_targets(offsets):
+    return [[(square // 8 + row)*8 + square % 8 + col for row, col in offsets if 0 <= square // 8 + row < 8 and 0 <= square % 8 + col < 8]
+        for square in range(64)]
+
+def _rays(directions):
+    rays = []
+    for square in range(64):
+        square_rays = []
+        for row_change, col_change in directions:
+            row, col, ray = square // 8 + row_change, square % 8 + col_change, []
+            while 0 <= row < 8 and 0 <= col < 8:
+                ray.append(row*8 + col)
+                row, col = row + row_change, col + col_change
+            square_rays.append(ray)
+        rays.append(square_rays)
+    return rays
+
+knight_targets = _leaper_targets([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+king_targets = _leaper_targets(orthogonal_directions + diagonal_directions)
+# orthogonal rays first, then diagonal ones
+slider_rays = [orthogonal + diagonal for orthogonal, diagonal in zip(_rays(orthogonal_directions), _rays(diagonal_directions))]
+slider_directions = {ROOK: slice(0, 4), BISHOP: slice(4, 8), QUEEN: slice(0, 8)}
+# material and piece-square value of each encoded code on each square, from white's point of view
+encoded_scores = [[0]*64] + [[(material_scores[code] + square_scores[code][square]) * (1 if code < 6 else -1) for square in range(64)]
+    for code in range(12)]
+
+def encode_child(position, move):
+    # the encoding after the move, worked out without making it on a board
+    child = bytearray(position)
+    start, target = move[0]*8 + move[1], move[2]*8 + move[3]
+    code, captured = child[start], child[target]
+    child[start] = 0
+    child[64] ^= 1
+    if captured and (captured-1) // 6 == (code-1) // 6:
+        # castling is stored as the king moving onto its own rook
+        step = 1 if target > start else -1
+        child[target] = 0
+        child[start + 2*step], child[start + step] = code, captured
+        return bytes(child)
+    if (code-1) % 6 == PAWN:
+        if not captured and move[1] != move[3]:
+            child[move[0]*8 + move[3]] = 0
+        if move[2] in (0, 7):
+            code = (code-1) // 6 * 6 + piece_types.index(move[4] if len(move) > 4 else "queen") + 1
+    child[target] = code
+    return bytes(child)
+
+def mobility(squares, square, piece_type):
+    # empty squares the piece attacks, pawns are left to the piece-square tables
+    if piece_type == KNIGHT or piece_type == KING:
+        return sum(1 for target in (knight_targets if piece_type == KNIGHT else king_targets)[square] if not squares[target])
+    if piece_type not in slider_directions:
+        return 0
+    count = 0
+    for ray in slider_rays[square][slider_directions[piece_type]]:
+        for target in ray:
+            if squares[target]:
+                break
+            count += 1
+    return count
+
+def evaluate_encoded(position):
+    score = 0
+    for square in range(64):
+        code = position[square]
+        if code:
+            score += encoded_scores[code][square]
+            sign = 1 if code <= 6 else -1
+            score += sign * mobility_weight * mobility(position, square, (code-1) % 6)
+    return score if position[64] == 0 else -score
+
+if numpy is not None:
+    score_array = numpy.array(encoded_scores, dtype=numpy.int32)
+    # piece type and sign of each encoded code, empty squares and pawns have no mobility
+    code_types = numpy.array([-1] + [-1 if code % 6 == 0 else code % 6 for code in range(12)])
+    code_signs = numpy.array([0] + [1 if code < 6 else -1 for code in range(12)])
+    # target squares and rays padded with index 64, a column that always reads as occupied
+    leaper_array = {}
+    for piece_type, targets in ((KNIGHT, knight_targets), (KING, king_targets)):
+        leaper_array[piece_type] = numpy.full((64, 8), 64)
+        for square in range(64):
+            leaper_array[piece_type][square, :len(targets[square])] = targets[square]
+    ray_array = numpy.full((64, 8, 7), 64)
+    for square in range(64):
+        for direction, ray in enumerate(slider_rays[square]):
+            ray_array[square, direction, :len(ray)] = ray
+
+def evaluate_batch(positions):
+    # scores from the side to move's point of view, the same as evaluate_encoded gives one at a time
+    if numpy is None or len(positions) < numpy_batch_minimum:
+        return [evaluate_encoded(position) for position in positions]
+    count = len(positions)
+    data = numpy.frombuffer(b"".join(positions), dtype=numpy.uint8).reshape(count, encoding_size)
+    squares = data[:, :64]
+    scores = score_array[squares, numpy.arange(64)].sum(axis=1)
+    empty = numpy.zeros((count, 65), dtype=bool)
+    empty[:, :64] = squares == 0
+    types = code_types[squares]
+    for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+        rows, cols = numpy.nonzero(types == piece_type)
+        if piece_type in leaper_array:
+            mobility = empty[rows[:, None], leaper_array[piece_type][cols]].sum(axis=1)
+        else:
+            rays = ray_array[cols][:, slider_directions[piece_type]]
+            mobility = numpy.logical_and.accumulate(empty[rows[:, None, None], rays], axis=2).sum(axis=(1, 2))
+        scores += mobility_weight * numpy.bincount(rows, weights=code_signs[squares[rows, cols]] * mobility, minlength=count).astype(numpy.int32)
+    scores = numpy.where(data[:, 64] == 0, scores, -scores)
+    return scores.tolist()
@@ -0,0 +1,119 @@
+import argparse
+import importlib
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from bitboard import BitBoard
+from opponent import Opponent
+
+# what a worker or CLI tool loads, against the same with the turtle GUI layer on top
+startup_imports = {
+    "interpreter": "",
+    "core": "opponent",
+    "core+gui": "opponent,gui,turtle",
+}
+
+openings = [
+    [],
+    [(6, 4, 4, 4), (1, 4, 3, 4), (7, 6, 5, 5), (0, 1, 2, 2)],
+    [(6, 3, 4, 3), (0, 6, 2, 5), (6, 2, 4, 2), (1, 4, 2, 4)],
+    [(6, 4, 4, 4), (1, 2, 3, 2), (7, 6, 5, 5), (1, 3, 2, 3), (6, 3, 4, 3), (3, 2, 4, 3)],
+]
+
+def benchmark_positions():
+    boards = []
+    for moves in openings:
+        board = BitBoard()
+        for move in moves:
+            board.make_move(move)
+            board.change_turns()
+        boards.append(board)
+    return boards
+
+def time_search(depth, workers):
+    opponent = Opponent(depth=depth, workers=workers)
+    nodes, moves = 0, []
+    start = time.perf_counter()
+    for board in benchmark_positions():
+        search = opponent.search(board)
+        moves.append(search.iterative_deepening()[0])
+        nodes += search.nodes
+    elapsed = time.perf_counter() - start
+    opponent.close()
+    return elapsed, nodes, moves
+
+def parallel(depth, workers):
+    serial_time, serial_nodes, serial_moves = time_search(depth, 1)
+    print(f"{1:>3} workers: {serial_time:.2f}s {serial_nodes} nodes {serial_nodes/serial_time:.0f} nps")
+    for count in workers:
+        elapsed, nodes, moves = time_search(depth, count)
+        same = sum(move == serial_move for move, serial_move in zip(moves, serial_moves))
+        print(f"{count:>3} workers: {elapsed:.2f}s {nodes} nodes {nodes/elapsed:.0f} nps, speedup {serial_time/elapsed:.2f}x, {same}/{len(moves)} moves match serial")
+
+def search_stats(depth, output, release=None, profile=False, batch_leaves=False):
+    opponent = Opponent(depth=depth, batch_leaves=batch_leaves)
+    for number, board in enumerate(benchmark_positions()):
+        opponent.make_move(board, profile=profile)
+        stats = opponent.stats
+        fields = {"position": number} if release is None else {"release": release, "position": number}
+        stats.write(output, **fields)
+        print(f"position {number}: depth {stats.depth} {stats.nodes} nodes {stats.nodes_per_second():.0f} nps, "
+            f"branching factor {stats.branching_factor():.2f}, table hits {stats.table_hit_rate():.1%}, pawn hits {stats.pawn_hit_rate():.1%}")
+        if profile:
+            stats.print_profile(10)
+    opponent.close()
+
+def load_modules(modules):
+    for module in filter(None, modules.split(",")):
+        importlib.import_module(module)
+
+def import_time(modules, repeats):
+    statement = f"import {modules}" if modules else "pass"
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def spawn_time(modules, workers, repeats):
+    # spawned workers start a fresh interpreter, so they pay for every module they import
+    context = multiprocessing.get_context("spawn")
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=load_modules, initargs=(modules,)) as executor:
+            list(executor.map(abs, range(workers)))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def startup(workers, repeats):
+    for name, modules in startup_imports.items():
+        print(f"{name:>12}: import {import_time(modules, repeats)*1000:.0f} ms, "
+            f"{workers} spawned workers {spawn_time(modules, workers, repeats)*1000:.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    parallel_parser = subparsers.add_parser("parallel")
+    parallel_parser.add_argument("--depth", type=int, default=4)
+    parallel_parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    stats_parser = subparsers.add_parser("stats")
+    stats_parser.add_argument("--depth", type=int, default=4)
+    stats_parser.add_argument("--output", default="stats.jsonl")
+    stats_parser.add_argument("--release", help="tag stored with each record, to compare releases")
+    stats_parser.add_argument("--profile", action="store_true", help="run under cProfile and record the time split")
+    stats_parser.add_argument("--batch-leaves", action="store_true", help="score leaves with the batched numpy evaluation")
+    startup_parser = subparsers.add_parser("startup")
+    startup_parser.add_argument("--workers", type=int, default=4)
+    startup_parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    if args.command == "parallel":
+        parallel(args.depth, args.workers)
+    elif args.command == "stats":
+        search_stats(args.depth, args.output, args.release, args.profile, args.batch_leaves)
+    elif args.command == "startup":
+        startup(args.workers, args.repeats)
@@ -0,0 +1,423 @@
+from players import Players
+from pieces import piece_types, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from zobrist import piece_keys, black_to_move, castling_keys, en_passant_key, position_hash
+from evaluation import material_scores, square_scores
+from rules import GameRules
+
+WHITE, BLACK = 0, 1
+
+colors = [Players.WHITE, Players.BLACK]
+color_index = {Players.WHITE: WHITE, Players.BLACK: BLACK}
+promotion_names = ["queen", "rook", "bishop", "knight"]
+
+square_coords = [(square // 8, square % 8) for square in range(64)]
+home_rows = [0xFF << 56, 0xFF]
+
+def _leaper_attacks(offsets):
+    table = []
+    for row, col in square_coords:
+        mask = 0
+        for row_change, col_change in offsets:
+            new_row, new_col = row+row_change, col+col_change
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                mask |= 1 << (new_row*8 + new_col)
+        table.append(mask)
+    return table
+
+def _rays(row_change, col_change):
+    table = []
+    for row, col in square_coords:
+        mask = 0
+        new_row, new_col = row+row_change, col+col_change
+        while 0 <= new_row < 8 and 0 <= new_col < 8:
+            mask |= 1 << (new_row*8 + new_col)
+            new_row += row_change
+            new_col += col_change
+        table.append(mask)
+    return table
+
+knight_attacks = _leaper_attacks([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+king_attacks = _leaper_attacks([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# indexed by the colour of the attacking pawn, white pawns move towards row 0
+pawn_attacks = [_leaper_attacks([(-1, -1), (-1, 1)]), _leaper_attacks([(1, -1), (1, 1)])]
+
+# rays pointing to higher square indices find their nearest blocker in the lowest set bit
+rook_rays = [(_rays(1, 0), True), (_rays(0, 1), True), (_rays(-1, 0), False), (_rays(0, -1), False)]
+bishop_rays = [(_rays(1, 1), True), (_rays(1, -1), True), (_rays(-1, 1), False), (_rays(-1, -1), False)]
+
+def _castle_path(rook_square):
+    king_square = rook_square - rook_square % 8 + 4
+    step = 1 if rook_square > king_square else -1
+    between = 0
+    for square in range(king_square+step, rook_square, step):
+        between |= 1 << square
+    return between, (king_square+step, king_square+2*step)
+
+castle_paths = {rook_square: _castle_path(rook_square) for rook_square in (0, 7, 56, 63)}
+
+def piece_code(piece):
+    return (WHITE if piece.white else BLACK)*6 + piece.type_index
+
+def slider_attacks(square, occupied, rays):
+    attacks = 0
+    for ray, positive in rays:
+        mask = ray[square]
+        blockers = mask & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            mask ^= ray[first]
+        attacks |= mask
+    return attacks
+
+class BitBoard(GameRules):
+    def __init__(self, set_up=True):
+        self.pieces = [[0]*6, [0]*6]
+        self.occupied = [0, 0]
+        self.squares = [None]*64
+        self.turn = Players.WHITE
+        self.castling_rooks = 0
+        self.en_passant = None
+        self.no_captures_or_pawn_moves = {
+            Players.WHITE: 0,
+            Players.BLACK: 0
+        }
+        self.hash = 0
+        # keyed on the pawns alone, for the pawn structure cache
+        self.pawn_hash = 0
+        self.material_scores = [0, 0]
+        self.position_scores = [0, 0]
+        self.history = []
+        if set_up:
+            self.set_up_pieces()
+        self.hash = self.compute_hash()
+
+    def set_up_pieces(self):
+        back_row = [ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK]
+        for col in range(8):
+            self._put(col, BLACK*6 + back_row[col])
+            self._put(8 + col, BLACK*6 + PAWN)
+            self._put(48 + col, WHITE*6 + PAWN)
+            self._put(56 + col, WHITE*6 + back_row[col])
+        self.castling_rooks = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+    @classmethod
+    def from_board(cls, board):
+        bitboard = cls(set_up=False)
+        for row in range(8):
+            for col in range(8):
+                piece = board.get_value(row, col)
+                if piece == 0:
+                    continue
+                bitboard._put(row*8 + col, piece_code(piece))
+        en_passant_col = board.en_passant_col()
+        if en_passant_col is not None:
+            row = board.en_passant_square[0]
+            bitboard.en_passant = (row+1 if row == 4 else row-1)*8 + en_passant_col
+        bitboard.castling_rooks = board.castling_rights()
+        bitboard.turn = board.turn
+        bitboard.no_captures_or_pawn_moves = dict(board.no_captures_or_pawn_moves)
+        bitboard.history = list(board.history)
+        bitboard.hash = bitboard.compute_hash()
+        return bitboard
+
+    def encode(self):
+        return bytes([0 if code is None else code+1 for code in self.squares] + [color_index[self.turn]])
+
+    def pack(self):
+        castling = sum(1 << index for index, square in enumerate(castle_paths) if self.castling_rooks >> square & 1)
+        return bytes([0 if code is None else code+1 for code in self.squares] + [
+            color_index[self.turn],
+            castling,
+            64 if self.en_passant is None else self.en_passant,
+            min(self.no_captures_or_pawn_moves[Players.WHITE], 255),
+            min(self.no_captures_or_pawn_moves[Players.BLACK], 255),
+        ])
+
+    @classmethod
+    def unpack(cls, data):
+        bitboard = cls(set_up=False)
+        for square, code in enumerate(data[:64]):
+            if code:
+                bitboard._put(square, code-1)
+        turn, castling, en_passant, white_clock, black_clock = data[64:]
+        bitboard.turn = colors[turn]
+        bitboard.castling_rooks = sum(1 << square for index, square in enumerate(castle_paths) if castling >> index & 1)
+        bitboard.en_passant = None if en_passant == 64 else en_passant
+        bitboard.no_captures_or_pawn_moves = {Players.WHITE: white_clock, Players.BLACK: black_clock}
+        bitboard.hash = bitboard.compute_hash()
+        return bitboard
+
+    def pawn_squares(self):
+        squares = [[], []]
+        for color in (WHITE, BLACK):
+            pawns = self.pieces[color][PAWN]
+            while pawns:
+                lowest = pawns & -pawns
+                pawns ^= lowest
+                squares[color].append(lowest.bit_length() - 1)
+        return squares
+
+    def compute_hash(self):
+        pieces = [(square, code) for square, code in enumerate(self.squares) if code is not None]
+        en_passant_col = None if self.en_passant is None else self.en_passant % 8
+        return position_hash(pieces, self.turn == Players.BLACK, self.castling_rooks, en_passant_col)
+
+    def _put(self, square, code):
+        color, piece_type = divmod(code, 6)
+        bit = 1 << square
+        self.pieces[color][piece_type] |= bit
+        self.occupied[color] |= bit
+        self.squares[square] = code
+        self.hash ^= piece_keys[code][square]
+        if piece_type == PAWN:
+            self.pawn_hash ^= piece_keys[code][square]
+        self.material_scores[color] += material_scores[code]
+        self.position_scores[color] += square_scores[code][square]
+
+    def _remove(self, square):
+        code = self.squares[square]
+        color, piece_type = divmod(code, 6)
+        bit = ~(1 << square)
+        self.pieces[color][piece_type] &= bit
+        self.occupied[color] &= bit
+        self.squares[square] = None
+        self.hash ^= piece_keys[code][square]
+        if piece_type == PAWN:
+            self.pawn_hash ^= piece_keys[code][square]
+        self.material_scores[color] -= material_scores[code]
+        self.position_scores[color] -= square_scores[code][square]
+        return code
+
+    def change_turns(self):
+        if self.turn == Players.WHITE:
+            self.turn = Players.BLACK
+        else:
+            self.turn = Players.WHITE
+        self.hash ^= black_to_move
+
+    def _castling_and_en_passant_key(self):
+        return castling_keys[self.castling_rooks] ^ en_passant_key(None if self.en_passant is None else self.en_passant % 8)
+
+    def king_square(self, color):
+        return self.pieces[color][KING].bit_length() - 1
+
+    def is_square_attacked(self, square, by_color):
+        pieces = self.pieces[by_color]
+        if knight_attacks[square] & pieces[KNIGHT]:
+            return True
+        if king_attacks[square] & pieces[KING]:
+            return True
+        if pawn_attacks[1-by_color][square] & pieces[PAWN]:
+            return True
+        occupied = self.occupied[WHITE] | self.occupied[BLACK]
+        if slider_attacks(square, occupied, rook_rays) & (pieces[ROOK] | pieces[QUEEN]):
+            return True
+        if slider_attacks(square, occupied, bishop_rays) & (pieces[BISHOP] | pieces[QUEEN]):
+            return True
+        return False
+
+    def in_check(self, color=None):
+        us = color_index[self.turn if color is None else color]
+        return self.is_square_attacked(self.king_square(us), 1-us)
+
+    def _pseudo_legal_moves(self, captures=True, quiets=True, origins=~0):
+        us = color_index[self.turn]
+        own = self.occupied[us]
+        occupied = own | self.occupied[1-us]
+        pieces = self.pieces[us]
+        moves = []
+
+        forward = -8 if us == WHITE else 8
+        start_row = 6 if us == WHITE else 1
+        promotion_row = 0 if us == WHITE else 7
+        enemy = self.occupied[1-us]
+        if self.en_passant is not None:
+            enemy |= 1 << self.en_passant
+        pawns = pieces[PAWN] & origins
+        while pawns:
+            lowest = pawns & -pawns
+            pawns ^= lowest
+            square = lowest.bit_length() - 1
+            targets = pawn_attacks[us][square] & enemy if captures else 0
+            one_step = square + forward
+            if not occupied >> one_step & 1:
+                # promotions are generated with the captures
+                if one_step // 8 == promotion_row:
+                    if captures:
+                        targets |= 1 << one_step
+                elif quiets:
+                    targets |= 1 << one_step
+                    if square // 8 == start_row and not occupied >> (one_step+forward) & 1:
+                        targets |= 1 << (one_step+forward)
+            while targets:
+                target_bit = targets & -targets
+                targets ^= target_bit
+                target = target_bit.bit_length() - 1
+                if target // 8 == promotion_row:
+                    for promotion in promotion_names:
+                        moves.append(square_coords[square] + square_coords[target] + (promotion,))
+                else:
+                    moves.append(square_coords[square] + square_coords[target])
+
+        wanted = (self.occupied[1-us] if captures else 0) | (~occupied if quiets else 0)
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            movers = pieces[piece_type] & origins
+            while movers:
+                lowest = movers & -movers
+                movers ^= lowest
+                square = lowest.bit_length() - 1
+                if piece_type == KNIGHT:
+                    targets = knight_attacks[square]
+                elif piece_type == BISHOP:
+                    targets = slider_attacks(square, occupied, bishop_rays)
+                elif piece_type == ROOK:
+                    targets = slider_attacks(square, occupied, rook_rays)
+                elif piece_type == QUEEN:
+                    targets = slider_attacks(square, occupied, rook_rays) | slider_attacks(square, occupied, bishop_rays)
+                else:
+                    targets = king_attacks[square]
+                targets &= wanted
+                while targets:
+                    target_bit = targets & -targets
+                    targets ^= target_bit
+                    moves.append(square_coords[square] + square_coords[target_bit.bit_length()-1])
+
+        if not quiets or not pieces[KING] & origins:
+            return moves
+        castling_rooks = self.castling_rooks & pieces[ROOK] & home_rows[us]
+        if castling_rooks and not self.in_check():
+            king_square = self.king_square(us)
+            while castling_rooks:
+                lowest = castling_rooks & -castling_rooks
+                castling_rooks ^= lowest
+                rook_square = lowest.bit_length() - 1
+                between, king_path = castle_paths[rook_square]
+                if between & occupied:
+                    continue
+                if any(self.is_square_attacked(square, 1-us) for square in king_path):
+                    continue
+                moves.append(square_coords[king_square] + square_coords[rook_square])
+        return moves
+
+    def get_pseudo_legal_captures(self):
+        return self._pseudo_legal_moves(quiets=False)
+
+    def get_pseudo_legal_quiets(self):
+        return self._pseudo_legal_moves(captures=False)
+
+    def is_pseudo_legal(self, move):
+        return move in self._pseudo_legal_moves(origins=1 << (move[0]*8 + move[1]))
+
+    def get_all_valid_moves(self):
+        us = color_index[self.turn]
+        valid_moves = []
+        for move in self._pseudo_legal_moves():
+            undo = self.make_move(move)
+            if not self.is_square_attacked(self.king_square(us), 1-us):
+                valid_moves.append(move)
+            self.unmake_move(undo)
+        return valid_moves
+
+    def make_move(self, move):
+        us = color_index[self.turn]
+        start = move[0]*8 + move[1]
+        target = move[2]*8 + move[3]
+        code = self.squares[start]
+        piece_type = code % 6
+        captured = self.squares[target]
+        undo = (start, target, code, captured, target, self.castling_rooks, self.en_passant, self.no_captures_or_pawn_moves[self.turn], self.hash)
+        self.history.append(self.hash)
+        self.hash ^= self._castling_and_en_passant_key()
+        self.en_passant = None
+
+        if piece_type == KING and captured == us*6 + ROOK:
+            step = 1 if target > start else -1
+            self._remove(start)
+            self._remove(target)
+            self._put(start + 2*step, code)
+            self._put(start + step, captured)
+            self.castling_rooks &= ~home_rows[us]
+            self.no_captures_or_pawn_moves[self.turn] += 1
+            self.hash ^= self._castling_and_en_passant_key()
+            return ("castle",) + undo
+
+        capture_square = target
+        if piece_type == PAWN and target == undo[6]:
+            capture_square = target + 8 if us == WHITE else target - 8
+            captured = self.squares[capture_square]
+            undo = undo[:3] + (captured, capture_square) + undo[5:]
+        if captured is not None:
+            self._remove(capture_square)
+        self._remove(start)
+        if piece_type == PAWN and target // 8 in (0, 7):
+            promotion = move[4] if len(move) > 4 else "queen"
+            self._put(target, us*6 + piece_types.index(promotion))
+        else:
+            self._put(target, code)
+
+        if piece_type == PAWN and abs(target - start) == 16 and pawn_attacks[us][(start + target) // 2] & self.pieces[1-us][PAWN]:
+            self.en_passant = (start + target) // 2
+        if piece_type == KING:
+            self.castling_rooks &= ~home_rows[us]
+        self.castling_rooks &= ~((1 << start) | (1 << target))
+        if piece_type == PAWN or captured is not None:
+            self.no_captures_or_pawn_moves[self.turn] = 0
+        else:
+            self.no_captures_or_pawn_moves[self.turn] += 1
+        self.hash ^= self._castling_and_en_passant_key()
+        return ("move",) + undo
+
+    def unmake_move(self, undo):
+        kind, start, target, code, captured, capture_square, castling_rooks, en_passant, clock, saved_hash = undo
+        if kind == "castle":
+            step = 1 if target > start else -1
+            self._remove(start + 2*step)
+            self._remove(start + step)
+            self._put(start, code)
+            self._put(target, captured)
+        else:
+            self._remove(target)
+            self._put(start, code)
+            if captured is not None:
+                self._put(capture_square, captured)
+        self.castling_rooks = castling_rooks
+        self.en_passant = en_passant
+        self.no_captures_or_pawn_moves[self.turn] = clock
+        self.hash = saved_hash
+        self.history.pop()
+
+    def move(self, old_row, old_col, new_row, new_col, promotion="queen"):
+        move = (old_row, old_col, new_row, new_col)
+        valid_moves = self.get_all_valid_moves()
+        if move not in valid_moves:
+            move += (promotion,)
+            if move not in valid_moves:
+                return False, "That isn't a valid move for that piece"
+        self.make_move(move)
+        return True, ""
+
+    def insufficient_material(self):
+        white, black = self.pieces
+        if white[PAWN] | black[PAWN] | white[ROOK] | black[ROOK] | white[QUEEN] | black[QUEEN]:
+            return False
+        knights = bin(white[KNIGHT] | black[KNIGHT]).count("1")
+        bishops = bin(white[BISHOP] | black[BISHOP]).count("1")
+        return (knights < 2 and bishops == 0) or (bishops < 2 and knights == 0)
+
+    def capture_values(self, move):
+        code = self.squares[move[0]*8 + move[1]]
+        target = self.squares[move[2]*8 + move[3]]
+        if target is None:
+            if code % 6 == PAWN and move[1] != move[3]:
+                return material_scores[PAWN], material_scores[code]
+            return 0, material_scores[code]
+        if target // 6 == code // 6:
+            return 0, material_scores[code]
+        return material_scores[target], material_scores[code]
+
+    def evaluate_position(self, color):
+        us = color_index[color]
+        return self.material_scores[us] + self.position_scores[us] - self.material_scores[1-us] - self.position_scores[1-us]
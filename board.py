@@ -1,8 +1,9 @@
-from copy import deepcopy
-import uuid
-from pieces import King, Queen, Knight, Rook, Bishop, Pawn
-import turtle
+from pieces import King, Queen, Knight, Rook, Bishop, Pawn, piece_types, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
 from players import Players
+from bitboard import piece_code
+from evaluation import material_scores, square_scores
+from zobrist import piece_keys, black_to_move, castling_keys, castling_squares, en_passant_key, position_hash
+from rules import GameRules
 
 padding = "\t"
 
@@ -14,8 +15,39 @@ queen_positions = [(0, 3), (7, 3)]
 
 alphabet = list(map(chr, range(97, 105)))
 
-class Board:
-    def __init__(self, square_size):
+promotion_pieces = {"queen": Queen, "rook": Rook, "bishop": Bishop, "knight": Knight}
+fen_pieces = {"p": Pawn, "n": Knight, "b": Bishop, "r": Rook, "q": Queen, "k": King}
+fen_letters = {piece: letter for letter, piece in fen_pieces.items()}
+fen_castling = {63: "K", 56: "Q", 7: "k", 0: "q"}
+
+def _offset_squares(offsets):
+    return [[[(row+row_change, col+col_change) for row_change, col_change in offsets if 0 <= row+row_change < 8 and 0 <= col+col_change < 8]
+        for col in range(8)] for row in range(8)]
+
+def _ray_squares(directions):
+    rays = [[[] for _ in range(8)] for _ in range(8)]
+    for row in range(8):
+        for col in range(8):
+            for row_change, col_change in directions:
+                ray = []
+                temp_row, temp_col = row+row_change, col+col_change
+                while 0 <= temp_row < 8 and 0 <= temp_col < 8:
+                    ray.append((temp_row, temp_col))
+                    temp_row += row_change
+                    temp_col += col_change
+                if ray:
+                    rays[row][col].append(ray)
+    return rays
+
+knight_squares = _offset_squares([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+king_neighbours = _offset_squares([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# squares a pawn of the given colour attacks the target from, white pawns move towards row 0
+pawn_attackers = {Players.WHITE: _offset_squares([(1, -1), (1, 1)]), Players.BLACK: _offset_squares([(-1, -1), (-1, 1)])}
+orthogonal_rays = _ray_squares([(-1, 0), (1, 0), (0, -1), (0, 1)])
+diagonal_rays = _ray_squares([(-1, -1), (-1, 1), (1, -1), (1, 1)])
+
+class Board(GameRules):
+    def __init__(self, fen=None):
         self.board = [[0, 0, 0, 0, 0, 0, 0, 0], 
             [0, 0, 0, 0, 0, 0, 0, 0], 
             [0, 0, 0, 0, 0, 0, 0, 0], 
@@ -26,19 +58,25 @@ class Board:
             [0, 0, 0, 0, 0, 0, 0, 0]
         ]
         
-        self.set_up_pieces()
         self.turn = Players.WHITE
-        self.square_size = square_size
-        self.black_square_color = (0.5,0.65,0.3)
-        self.white_square_color = (0.9, 0.9, 0.8)
-        self.border_color = (0, 0, 0)
-        self.selected_color = (1, 0, 0)
-        self.highlighted_squares = []
-        self.selected = None
+        self.en_passant_square = None
         self.no_captures_or_pawn_moves = {
             Players.WHITE: 0,
             Players.BLACK: 0
         }
+        # plies since the last capture or pawn move by either side, as FEN counts it
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        if fen is None:
+            self.set_up_pieces()
+        else:
+            self.set_up_fen(fen)
+        self.changed_squares = []
+        self.history = []
+        self.hash = self.compute_hash()
+        self.material_scores, self.position_scores = self.compute_scores()
+        self.piece_squares, self.king_squares = self.compute_piece_squares()
+        self.pawn_hash = self.compute_pawn_hash()
 
     def set_up_pieces(self):
         for i in range(8):
@@ -55,13 +93,183 @@ class Board:
         for queen_pos in queen_positions:
             self.board[queen_pos[0]][queen_pos[1]] = Queen(queen_pos[0])
     
+    def set_up_fen(self, fen):
+        # missing trailing fields take their defaults by position
+        fields = fen.split()
+        fields += ["w", "-", "-", "0", "1"][len(fields)-1:]
+        placement, turn, castling, en_passant, halfmove_clock, fullmove_number = fields[:6]
+        ranks = placement.split("/")
+        if len(ranks) != 8:
+            raise ValueError(f"expected 8 ranks, got {len(ranks)}")
+        # the search and attack tables assume each side has exactly one king
+        if placement.count("K") != 1 or placement.count("k") != 1:
+            raise ValueError("each side needs exactly one king")
+        for row, rank in enumerate(ranks):
+            if sum(int(char) if char.isdigit() else 1 for char in rank) != 8:
+                raise ValueError(f"rank {8-row} does not have 8 squares")
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                piece = fen_pieces[char.lower()](7 if char.isupper() else 0)
+                piece.first = isinstance(piece, Pawn) and row == (6 if piece.white else 1)
+                self.board[row][col] = piece
+                col += 1
+        for char, (row, col) in zip("KQkq", [(7, 7), (7, 0), (0, 7), (0, 0)]):
+            if char in castling:
+                rook, king = self.board[row][col], self.board[row][4]
+                if isinstance(rook, Rook) and isinstance(king, King) and rook.white == king.white == char.isupper():
+                    rook.first = king.first = True
+        self.turn = Players.WHITE if turn == "w" else Players.BLACK
+        if en_passant != "-":
+            row, col = (4 if en_passant[1] == "3" else 3), alphabet.index(en_passant[0])
+            if isinstance(self.board[row][col], Pawn):
+                self.board[row][col].en_passantable = True
+                self.en_passant_square = (row, col)
+        mover = Players.BLACK if self.turn == Players.WHITE else Players.WHITE
+        self.no_captures_or_pawn_moves[mover] = (int(halfmove_clock)+1) // 2
+        self.no_captures_or_pawn_moves[self.turn] = int(halfmove_clock) // 2
+        self.halfmove_clock = int(halfmove_clock)
+        self.fullmove_number = int(fullmove_number)
+
+    def get_fen(self):
+        ranks = []
+        for row in self.board:
+            rank, empty = "", 0
+            for piece in row:
+                if piece == 0:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = fen_letters[piece.__class__]
+                rank += letter.upper() if piece.white else letter
+            ranks.append(rank + (str(empty) if empty else ""))
+        rights = self.castling_rights()
+        castling = "".join(letter for square, letter in fen_castling.items() if rights >> square & 1) or "-"
+        en_passant = "-"
+        if self.en_passant_square is not None:
+            row, col = self.en_passant_square
+            en_passant = f"{alphabet[col]}{3 if row == 4 else 6}"
+        turn = "w" if self.turn == Players.WHITE else "b"
+        return f"{'/'.join(ranks)} {turn} {castling} {en_passant} {self.halfmove_clock} {self.fullmove_number}"
+
     def get_value(self, row, column):
         return self.board[row][column]
 
     def set_value(self, row, column, new_val):
+        old_val = self.board[row][column]
+        square = row*8 + column
+        if old_val != 0:
+            code = piece_code(old_val)
+            self.hash ^= piece_keys[code][square]
+            if code % 6 == PAWN:
+                self.pawn_hash ^= piece_keys[code][square]
+            self.material_scores[old_val.piece_color] -= material_scores[code]
+            self.position_scores[old_val.piece_color] -= square_scores[code][square]
+            self.piece_squares[old_val.piece_color][code % 6].discard((row, column))
+        if new_val != 0:
+            code = piece_code(new_val)
+            self.hash ^= piece_keys[code][square]
+            if code % 6 == PAWN:
+                self.pawn_hash ^= piece_keys[code][square]
+            self.material_scores[new_val.piece_color] += material_scores[code]
+            self.position_scores[new_val.piece_color] += square_scores[code][square]
+            self.piece_squares[new_val.piece_color][code % 6].add((row, column))
+            if code % 6 == KING:
+                self.king_squares[new_val.piece_color] = (row, column)
         self.board[row][column] = new_val
 
-    def check_move(self, old_row, old_col, new_row, new_col):
+    def capture_values(self, move):
+        piece = self.board[move[0]][move[1]]
+        target = self.board[move[2]][move[3]]
+        if target == 0:
+            if isinstance(piece, Pawn) and move[1] != move[3]:
+                return self.board[move[0]][move[3]].worth, piece.worth
+            return 0, piece.worth
+        if target.white == piece.white:
+            return 0, piece.worth
+        return target.worth, piece.worth
+
+    def castling_rights(self):
+        rights = 0
+        for square in castling_squares:
+            row, col = divmod(square, 8)
+            rook, king = self.get_value(row, col), self.get_value(row, 4)
+            if rook == 0 or king == 0 or rook.white != king.white or not (rook.first and king.first):
+                continue
+            if rook.type_index == ROOK and king.type_index == KING:
+                rights |= 1 << square
+        return rights
+
+    def en_passant_col(self):
+        if self.en_passant_square is None:
+            return None
+        row, col = self.en_passant_square
+        pawn = self.get_value(row, col)
+        for side_col in (col-1, col+1):
+            if 0 <= side_col < len(self.board[0]):
+                side = self.get_value(row, side_col)
+                if side != 0 and side.white != pawn.white and side.type_index == PAWN:
+                    return col
+        return None
+
+    def encode(self):
+        return bytes([0 if piece == 0 else piece_code(piece)+1 for row in self.board for piece in row] + [0 if self.turn == Players.WHITE else 1])
+
+    def compute_hash(self):
+        pieces = []
+        for row in range(len(self.board)):
+            for col in range(len(self.board[0])):
+                if self.board[row][col] != 0:
+                    pieces.append((row*8 + col, piece_code(self.board[row][col])))
+        return position_hash(pieces, self.turn == Players.BLACK, self.castling_rights(), self.en_passant_col())
+
+    def compute_pawn_hash(self):
+        key = 0
+        for row in range(len(self.board)):
+            for col in range(len(self.board[0])):
+                piece = self.board[row][col]
+                if piece != 0 and piece.type_index == PAWN:
+                    key ^= piece_keys[piece_code(piece)][row*8 + col]
+        return key
+
+    def pawn_squares(self):
+        return [[row*8 + col for row, col in self.piece_squares[color][PAWN]] for color in (Players.WHITE, Players.BLACK)]
+
+    def compute_scores(self):
+        material = {Players.WHITE: 0, Players.BLACK: 0}
+        position = {Players.WHITE: 0, Players.BLACK: 0}
+        for row in range(len(self.board)):
+            for col in range(len(self.board[0])):
+                piece = self.board[row][col]
+                if piece != 0:
+                    code = piece_code(piece)
+                    material[piece.piece_color] += material_scores[code]
+                    position[piece.piece_color] += square_scores[code][row*8 + col]
+        return material, position
+
+    def compute_piece_squares(self):
+        piece_squares = {color: [set() for _ in piece_types] for color in Players}
+        king_squares = {}
+        for row in range(len(self.board)):
+            for col in range(len(self.board[0])):
+                piece = self.board[row][col]
+                if piece != 0:
+                    piece_squares[piece.piece_color][piece.type_index].add((row, col))
+                    if piece.type_index == KING:
+                        king_squares[piece.piece_color] = (row, col)
+        return piece_squares, king_squares
+
+    def get_positions(self, color, piece_type):
+        return self.piece_squares[color][piece_type]
+
+    def get_king_position(self, color):
+        return self.king_squares[color]
+
+    def check_move(self, old_row, old_col, new_row, new_col, legal=True):
         piece = self.get_value(old_row, old_col)
         previous_val = self.get_value(new_row, new_col)
         if piece == 0:
@@ -79,48 +287,121 @@ class Board:
         valid_move = piece.is_valid_move(old_row, old_col, new_row, new_col, self)
         if not valid_move:
             return False, "That isn't a valid move for that piece"
-        self.set_value(old_row, old_col, 0)
-        self.set_value(new_row, new_col, piece)
+        # the search makes the move anyway, so it checks the king itself
+        if not legal:
+            return valid_move, ""
+        undo = self.make_move((old_row, old_col, new_row, new_col))
         in_check = self.in_check()
-        self.set_value(old_row, old_col, piece)
-        self.set_value(new_row, new_col, previous_val)
+        self.unmake_move(undo)
         if in_check:
             return False, "The king would be in check"
         if valid_move in ["en_passant", "double_pawn_move"]:
             return valid_move, ""
         return True, ""
     
-    def move(self, old_row, old_col, new_row, new_col):
+    def move(self, old_row, old_col, new_row, new_col, promotion="queen"):
         result, expl = self.check_move(old_row, old_col, new_row, new_col)
-        self.set_en_passantable(self.get_value(old_row, old_col)) if result == "double_pawn_move" else self.set_en_passantable()
-        if result and self.get_value(new_row, new_col) == 0 and self.get_value(old_row, old_col).__class__.__name__.lower() != "pawn":
+        if not result:
+            return False, expl
+        undo = self.make_move((old_row, old_col, new_row, new_col, promotion))
+        self.changed_squares = self.move_squares(undo)
+        if self.turn == Players.BLACK:
+            self.fullmove_number += 1
+        return True, "" if result == "castle" else expl
+
+    def make_move(self, move):
+        old_row, old_col, new_row, new_col = move[:4]
+        piece = self.get_value(old_row, old_col)
+        captured = self.get_value(new_row, new_col)
+        piece_type = piece.type_index
+        undo = {
+            "move": move,
+            "piece": piece,
+            "captured": captured,
+            "captured_pos": (new_row, new_col),
+            "first": piece.first,
+            "en_passant_square": self.en_passant_square,
+            "no_captures_or_pawn_moves": self.no_captures_or_pawn_moves[self.turn],
+            "halfmove_clock": self.halfmove_clock,
+            "castle": False,
+            "hash": self.hash,
+        }
+        self.history.append(self.hash)
+        self.hash ^= castling_keys[self.castling_rights()] ^ en_passant_key(self.en_passant_col())
+        if self.en_passant_square is not None:
+            self.get_value(*self.en_passant_square).en_passantable = False
+            self.en_passant_square = None
+        if captured != 0 and captured.white == piece.white:
+            step = -1 if new_col < old_col else 1
+            undo["castle"] = True
+            undo["rook_first"] = captured.first
+            self.set_value(old_row, old_col, 0)
+            self.set_value(new_row, new_col, 0)
+            self.set_value(old_row, old_col+2*step, piece)
+            self.set_value(old_row, old_col+step, captured)
+            piece.first, captured.first = False, False
             self.no_captures_or_pawn_moves[self.turn] += 1
-        elif result and (self.get_value(new_row, new_col) != 0 or self.get_value(old_row, old_col).__class__.__name__.lower() == "pawn"):
+            self.halfmove_clock += 1
+            self.hash ^= castling_keys[self.castling_rights()]
+            return undo
+        if piece_type == PAWN and captured == 0 and old_col != new_col:
+            undo["captured"] = self.get_value(old_row, new_col)
+            undo["captured_pos"] = (old_row, new_col)
+            self.set_value(old_row, new_col, 0)
+        self.set_value(old_row, old_col, 0)
+        if piece_type == PAWN and (new_row == 0 or new_row == 7):
+            promotion = move[4] if len(move) > 4 else "queen"
+            promoted = promotion_pieces[promotion](abs(new_row-len(self.board)))
+            promoted.first = False
+            self.set_value(new_row, new_col, promoted)
+        else:
+            self.set_value(new_row, new_col, piece)
+        piece.first = False
+        if piece_type == PAWN and abs(new_row-old_row) == 2:
+            piece.en_passantable = True
+            self.en_passant_square = (new_row, new_col)
+        if piece_type == PAWN or undo["captured"] != 0:
             self.no_captures_or_pawn_moves[self.turn] = 0
-        if result == "castle":
-            king = self.get_value(old_row, old_col)
-            rook = self.get_value(new_row, new_col)
-            king.first, rook.first = False, False
-            new_rook_pos = (old_row, old_col-1 if new_col < old_col else old_col+1)
-            new_king_pos = (new_row, old_col-2 if new_col < old_col else old_col+2)
-            self.set_value(new_rook_pos[0], new_rook_pos[1], rook)
-            self.set_value(new_king_pos[0], new_king_pos[1], king)
-            self.set_value(old_row, old_col, 0)
+            self.halfmove_clock = 0
+        else:
+            self.no_captures_or_pawn_moves[self.turn] += 1
+            self.halfmove_clock += 1
+        self.hash ^= castling_keys[self.castling_rights()] ^ en_passant_key(self.en_passant_col())
+        return undo
+
+    def move_squares(self, undo):
+        old_row, old_col, new_row, new_col = undo["move"][:4]
+        squares = [(old_row, old_col), (new_row, new_col)]
+        if undo["castle"]:
+            step = -1 if new_col < old_col else 1
+            squares += [(old_row, old_col+step), (old_row, old_col+2*step)]
+        elif undo["captured_pos"] != (new_row, new_col):
+            squares.append(undo["captured_pos"])
+        return squares
+
+    def unmake_move(self, undo):
+        old_row, old_col, new_row, new_col = undo["move"][:4]
+        piece = undo["piece"]
+        if undo["castle"]:
+            step = -1 if new_col < old_col else 1
+            self.set_value(old_row, old_col+2*step, 0)
+            self.set_value(old_row, old_col+step, 0)
+            self.set_value(new_row, new_col, undo["captured"])
+            undo["captured"].first = undo["rook_first"]
+        else:
             self.set_value(new_row, new_col, 0)
-            return True, ""
-        if result == "en_passant":
-            self.set_value(new_row, new_col, self.get_value(old_row, old_col))
-            self.set_value(old_row, old_col, 0)
-            self.set_value(new_row+1 if self.turn == Players.WHITE else new_row-1 , new_col, 0)
-            return True, expl
-        if result:
-            self.set_value(new_row, new_col, self.get_value(old_row, old_col))
-            if self.get_value(old_row, old_col).__class__.__name__.lower() == "pawn" and (new_row == 0 or new_row == 7):
-                self.set_value(new_row, new_col, Queen(abs(new_row-len(self.board))))
-            self.set_value(old_row, old_col, 0)
-            self.get_value(new_row, new_col).first = False
-            return True, expl
-        return False, expl
+            if undo["captured"] != 0:
+                self.set_value(*undo["captured_pos"], undo["captured"])
+        self.set_value(old_row, old_col, piece)
+        piece.first = undo["first"]
+        piece.en_passantable = False
+        self.en_passant_square = undo["en_passant_square"]
+        if self.en_passant_square is not None:
+            self.get_value(*self.en_passant_square).en_passantable = True
+        self.no_captures_or_pawn_moves[self.turn] = undo["no_captures_or_pawn_moves"]
+        self.halfmove_clock = undo["halfmove_clock"]
+        self.hash = undo["hash"]
+        self.history.pop()
     
     def get_board(self):
         if self.turn == Players.WHITE:
@@ -133,6 +414,7 @@ class Board:
             self.turn = Players.BLACK
         else:
             self.turn = Players.WHITE
+        self.hash ^= black_to_move
 
     def get_diagonal(self, row, column):
         directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
@@ -155,90 +437,33 @@ class Board:
                 temp_column += column_change
         return lines
 
-    def in_check(self, board=None):
-        if board is None:
-            board = self
-        piece_positions = board.get_piece_positions()
-        enemy_color = Players.BLACK if board.turn == Players.WHITE else Players.WHITE
-        king_row, king_column = piece_positions[board.turn]["king"]["pos"]
-        for piece_dict in list(piece_positions[enemy_color].values()):
-            row, column = piece_dict["pos"]
-            piece = piece_dict["piece"]
-            if piece.is_valid_move(row, column, king_row, king_column, board):
-                return True
+    def is_square_attacked(self, square, by_color):
+        board = self.board
+        row, col = square
+        for attackers, piece_classes in ((knight_squares, Knight), (king_neighbours, King), (pawn_attackers[by_color], Pawn)):
+            for attacker_row, attacker_col in attackers[row][col]:
+                piece = board[attacker_row][attacker_col]
+                if piece != 0 and piece.piece_color == by_color and isinstance(piece, piece_classes):
+                    return True
+        for rays, piece_classes in ((orthogonal_rays, (Rook, Queen)), (diagonal_rays, (Bishop, Queen))):
+            for ray in rays[row][col]:
+                for ray_row, ray_col in ray:
+                    piece = board[ray_row][ray_col]
+                    if piece != 0:
+                        if piece.piece_color == by_color and isinstance(piece, piece_classes):
+                            return True
+                        break
         return False
-                    
-    def get_piece_positions(self):
-        black = {}
-        white = {}
-        for row in range(len(self.get_board())):
-            for column in range(len(self.get_board()[0])):
-                piece = self.get_value(row, column)
-                if piece != 0:
-                    name = str(self.get_value(row, column).__class__.__name__).lower()
-                    if (name != "king"):
-                        name += f"_{uuid.uuid4().hex.upper()[0:6]}"
-                    piece_dict = {"piece": piece, "pos":(row, column)}
-                    if piece.white:
-                        white[name] = piece_dict
-                    else:
-                        black[name] = piece_dict
-        return {Players.WHITE:white,Players.BLACK:black}
-                    
-    def check_mate(self, color=None):
-        if color is None:
-            color = self.turn
-        if not self.in_check():
+
+    def in_check(self):
+        enemy_color = Players.BLACK if self.turn == Players.WHITE else Players.WHITE
+        return self.is_square_attacked(self.king_squares[self.turn], enemy_color)
+
+    def insufficient_material(self):
+        amounts = [len(white) + len(black) for white, black in zip(self.piece_squares[Players.WHITE], self.piece_squares[Players.BLACK])]
+        if amounts[ROOK] or amounts[QUEEN] or amounts[PAWN]:
             return False
-        pieces = list(self.get_piece_positions()[color].values())
-        for row in range(len(self.board)): 
-            for col in range(len(self.board[0])):
-                for piece_dict in pieces:
-                    curr_row, curr_col = piece_dict["pos"]
-                    if self.check_move(curr_row, curr_col, row, col)[0]:
-                        test_board = deepcopy(self)
-                        test_board.move(curr_row, curr_col, row, col)
-                        if not test_board.in_check():
-                            return False
-        return True
-
-    def stale_mate(self):
-        pieces = list(self.get_piece_positions()[self.turn].values())
-        for row in range(len(self.board)): 
-            for col in range(len(self.board[0])):
-                for piece_dict in pieces:
-                    curr_row, curr_col = piece_dict["pos"]
-                    if self.check_move(curr_row, curr_col, row, col)[0]:
-                            return False
-        return True
-    
-    def draw(self):
-        if self.stale_mate():
-            print("A stalemate")
-            return True
-        pieces = list(self.get_piece_positions()[Players.BLACK].values()) + list(self.get_piece_positions()[Players.WHITE].values())
-        amounts = {
-            "bishop": 0,
-            "rook": 0,
-            "queen": 0,
-            "knight": 0,
-            "pawn": 0,
-        }
-        for key, _ in amounts.items():
-            for piece in pieces:
-                if piece["piece"].__class__.__name__.lower() == key:
-                    amounts[key] += 1
-        if amounts["rook"] == 0 and amounts["queen"] == 0 and amounts["pawn"] == 0:
-            if amounts["knight"] < 2 and amounts["bishop"] == 0:
-                print("Not enough material")
-                return True
-            if amounts["bishop"] < 2 and amounts["knight"] == 0:
-                print("Not enough material")
-                return True
-        if self.no_captures_or_pawn_moves[Players.WHITE] >= 50 and self.no_captures_or_pawn_moves[Players.BLACK] >= 50:
-            print("No captures or pawn moves in  50")
-            return True
-        return False
+        return (amounts[KNIGHT] < 2 and amounts[BISHOP] == 0) or (amounts[BISHOP] < 2 and amounts[KNIGHT] == 0)
 
     def castle(self, old_row, old_col, new_row, new_col):
         king = self.get_value(old_row, old_col)
@@ -250,149 +475,55 @@ class Board:
             return False
         if horizontals[-1] != rook:
             return False
-        if self.in_check():
-            return False
-        for col in range(old_col+step, new_col, step):
-            self.set_value(old_row, old_col, 0)
-            self.set_value(old_row, col, king)
-            in_check = self.in_check()
-            self.set_value(old_row, old_col, king)
-            self.set_value(old_row, col, 0)
-            if in_check:
+        enemy_color = Players.BLACK if king.white else Players.WHITE
+        for col in (old_col, old_col+step, old_col+2*step):
+            if self.is_square_attacked((old_row, col), enemy_color):
                 return False
         return "castle"
     
-    def set_en_passantable(self, moved_piece=None):
-        pieces = list(self.get_piece_positions()[Players.WHITE].values()) + list(self.get_piece_positions()[Players.BLACK].values())
-        for piece in pieces:
-            if piece["piece"] == moved_piece:
-                moved_piece.en_passantable = True
-                continue
-            piece["piece"].en_passantable = False
-
-    def _draw_square(self, white, x, y, pen):
-        pen.up()
-        pen.goto(x, y)
-        pen.down()
-        color = self.white_square_color if white else self.black_square_color
-        pen.fillcolor(color)
-        pen.pencolor(self.border_color)
-        pen.begin_fill() 
-        for _ in range(4):
-            pen.forward(self.square_size)
-            pen.right(360 / 4)
-        pen.end_fill()
-
-    def _draw_piece(self, x, y, piece, pen):
-        pen.up()
-        pen.goto(x, y)
-        pen.down()
-        pen.shape(piece.value)
-        pen.stamp()
-        pen.ht()
-    
-    def _highlight(self, color, square, pen):
-        if self.turn == Players.BLACK:
-            square = (len(self.board)-1-square[0], len(self.board[0])-1-square[1])
-        x, y = 1+self.square_size*square[1], self.square_size+self.square_size*square[0]
-        pen.pencolor(color)
-        pen.up()
-        pen.goto(x, y)
-        pen.down()
-        for _ in range(4):
-            pen.forward(self.square_size)
-            pen.right(360 / 4)
-
-    def handle_clicks(self, row, col, pen):
-        row, col = len(self.board)-1-row if self.turn == Players.BLACK else row, len(self.board[0])-1-col if self.turn == Players.BLACK else col
-        return_value = None
-        if len(self.highlighted_squares) > 0:
-            self._highlight(color=self.border_color, square=self.selected, pen=pen)
-            for square in self.highlighted_squares:
-                if (row, col) == square:
-                    return_value = self.move(self.selected[0], self.selected[1], row, col)
-                self._highlight(color=self.border_color, square=square, pen=pen)
-        self.highlighted_squares = []
-        if return_value is not None:
-            self.selected = None
-            return return_value
-        value = self.get_value(row, col)
-        if value == 0:
-            return False, ""
-        if (self.turn == Players.WHITE and not value.white) or (self.turn == Players.BLACK and value.white):
-            return False, ""
-        self.selected = (row, col)
-        for move in value.get_all_valid_moves(row, col, self)+[(row, col)]:
-            self.highlighted_squares.append(move)
-            self._highlight(square=move, color=self.selected_color, pen=pen)
-        turtle.update()
-        return False, ""
-
-    def draw_board(self, pen, square_changes=None):
-        if square_changes is None:
-            square_changes = [[False]*8]*8
-        elif square_changes is not None and self.turn == Players.BLACK:
-            square_changes = [x[::-1] for x in square_changes][::-1]
-        for row in range(len(self.get_board())):
-            for col in range(len(self.get_board()[0])):
-                if square_changes[row][col] == False:
-                    x, y = 1 + self.square_size*col, self.square_size + self.square_size*row
-                    value = self.get_board()[row][col]
-                    self._draw_square(True, x, y, pen) if (row+col) % 2 == 0 else self._draw_square(False, x, y, pen)
-                    if value != 0:
-                        self._draw_piece(x+0.5*self.square_size, y-0.5*self.square_size, value, pen)     
-        turtle.update()
-    
-    def display_text(self, pen, text):
-        pen.up()
-        pen.goto(800/2-(20*len(text)), 800/2)
-        pen.down()
-        pen.pencolor(self.selected_color)
-        pen.write(text.upper(), font=("Arial", 50, "bold"))
-        pen.ht()
-        turtle.update()
-    
-    def get_changed_squares(self, old_board):
-        for row in range(len(self.board)):
-            for col in range(len(self.board[0])):
-                old_board[row][col] = repr(self.board[row][col]) == repr(old_board[row][col])
-        return old_board
-    
     def evaluate_position(self, color):
         opponent_color = Players.BLACK if color == Players.WHITE else Players.WHITE
-        own_pieces = list(self.get_piece_positions()[color].values())
-        opponent_pieces = list(self.get_piece_positions()[opponent_color].values())
-        own_pieces_worth, opponent_pieces_worth = 0, 0
-        for own_piece in own_pieces:
-            own_pieces_worth += own_piece["piece"].worth
-        for opponent_piece in opponent_pieces:
-            opponent_pieces_worth += opponent_piece["piece"].worth
-        if self.check_mate(color):
-            return float("-inf")
-        if self.draw():
-            return 0
-        if self.in_check():
-            return (own_pieces_worth-opponent_pieces_worth)-500
-        return own_pieces_worth-opponent_pieces_worth
+        return self.material_scores[color] + self.position_scores[color] - self.material_scores[opponent_color] - self.position_scores[opponent_color]
 
     def get_all_valid_moves(self):
-        pieces = [piece["pos"] for piece in list(self.get_piece_positions()[self.turn].values())]
         valid_moves = []
-        for piece_row, piece_col in pieces:
-            moves_for_piece = self.get_value(piece_row, piece_col).get_all_valid_moves(piece_row, piece_col, self)
-            if moves_for_piece:
-                valid_moves.append([(piece_row, piece_col) + move for move in moves_for_piece])
-        return sum(valid_moves, [])
-
-    def check_draw_and_mate(self, pen):
-        if self.check_mate():
-            self.change_turns()
-            turn = self.turn.value.lower().capitalize()
-            self.change_turns()
-            self.display_text(pen, f"{turn} won!")
-            turtle.done()
-            quit()
-        if self.draw():
-            self.display_text(pen, "A draw!")
-            turtle.done()
-            quit()
\ No newline at end of file
+        for piece_type, positions in enumerate(self.piece_squares[self.turn]):
+            for piece_row, piece_col in tuple(positions):
+                for move in self.get_value(piece_row, piece_col).get_all_valid_moves(piece_row, piece_col, self):
+                    if piece_type == PAWN and (move[0] == 0 or move[0] == 7):
+                        valid_moves.extend((piece_row, piece_col) + move + (promotion,) for promotion in promotion_pieces)
+                    else:
+                        valid_moves.append((piece_row, piece_col) + move)
+        return valid_moves
+
+    def _pseudo_legal_moves(self, captures):
+        # targets are split by what stands on them before any move is tried, so each node tries every target once
+        moves = []
+        for piece_type, positions in enumerate(self.piece_squares[self.turn]):
+            for piece_row, piece_col in tuple(positions):
+                piece = self.board[piece_row][piece_col]
+                for new_row in range(8):
+                    promotion = piece_type == PAWN and new_row in (0, 7)
+                    for new_col in range(8):
+                        target = self.board[new_row][new_col]
+                        capture = promotion or (target != 0 and target.white != piece.white) or (piece_type == PAWN and new_col != piece_col)
+                        if capture != captures or not self.check_move(piece_row, piece_col, new_row, new_col, legal=False)[0]:
+                            continue
+                        if promotion:
+                            moves.extend((piece_row, piece_col, new_row, new_col, name) for name in promotion_pieces)
+                        else:
+                            moves.append((piece_row, piece_col, new_row, new_col))
+        return moves
+
+    # these leave the king's safety to the search, which rejects moves that leave it in check
+    def get_pseudo_legal_captures(self):
+        return self._pseudo_legal_moves(True)
+
+    def get_pseudo_legal_quiets(self):
+        return self._pseudo_legal_moves(False)
+
+    def is_pseudo_legal(self, move):
+        piece = self.get_value(move[0], move[1])
+        if piece == 0 or not self.check_move(*move[:4], legal=False)[0]:
+            return False
+        return (piece.type_index == PAWN and move[2] in (0, 7)) == (len(move) > 4)
@@ -0,0 +1,141 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import re
+import struct
+from bitboard import BitBoard
+from notation import parse_move, parse_san
+from players import Players
+from transposition import encode_move, decode_move
+
+# sorted big-endian records of position hash, encoded move and weight
+entry = struct.Struct(">QHH")
+results = ("1-0", "0-1", "1/2-1/2", "*")
+max_weight = 0xFFFF
+
+class OpeningBook:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size // entry.size
+        # pages of a read-only mapping are shared by every process using the same book
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def entries(self, key):
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if entry.unpack_from(self.data, middle*entry.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.size:
+            stored_key, move, weight = entry.unpack_from(self.data, low*entry.size)
+            if stored_key != key:
+                break
+            found.append((decode_move(move), weight))
+            low += 1
+        return found
+
+    def choose(self, board, randomizer=random):
+        found = self.entries(board.hash)
+        if not found:
+            return None
+        # a hash collision must never produce an illegal move
+        valid_moves = board.get_all_valid_moves()
+        # moves that only lost carry no weight and are never played
+        found = [(move, weight) for move, weight in found if weight > 0 and move in valid_moves]
+        if not found:
+            return None
+        moves, weights = zip(*found)
+        return randomizer.choices(moves, weights)[0]
+
+    def close(self):
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+def result_weight(result, turn):
+    if result == "1-0":
+        return 2 if turn == Players.WHITE else 0
+    if result == "0-1":
+        return 2 if turn == Players.BLACK else 0
+    return 1
+
+def read_pgn(path):
+    with open(path) as pgn:
+        lines = []
+        for line in pgn:
+            line = line.split(";")[0].strip()
+            if line.startswith("["):
+                if lines:
+                    yield parse_movetext(" ".join(lines))
+                    lines = []
+            elif line and not line.startswith("%"):
+                lines.append(line)
+        if lines:
+            yield parse_movetext(" ".join(lines))
+
+def parse_movetext(text):
+    text = re.sub(r"\{[^}]*\}|\$\d+", " ", text)
+    while "(" in text:
+        text, count = re.subn(r"\([^()]*\)", " ", text)
+        if not count:
+            break
+    tokens = re.sub(r"\d+\.+", " ", text).split()
+    result = tokens.pop() if tokens and tokens[-1] in results else "*"
+    return tokens, result, 0
+
+def read_selfplay(path):
+    with open(path) as log:
+        for line in log:
+            record = json.loads(line)
+            if "moves" in record:
+                yield record["moves"], record["result"], record.get("opening_plies", 0)
+
+readers = {
+    "pgn": (read_pgn, parse_san),
+    "selfplay": (read_selfplay, lambda board, name: parse_move(name)),
+}
+
+def build(paths, output, plies=20, min_weight=1):
+    # a zero weight entry could never be chosen, so it is not worth writing
+    min_weight = max(min_weight, 1)
+    weights = {}
+    games = 0
+    for path in paths:
+        read, parse = readers["pgn" if path.endswith(".pgn") else "selfplay"]
+        for tokens, result, first_ply in read(path):
+            board = BitBoard()
+            for ply, token in enumerate(tokens[:plies]):
+                try:
+                    move = parse(board, token)
+                except (ValueError, KeyError, IndexError):
+                    break
+                if move not in board.get_all_valid_moves():
+                    break
+                if ply >= first_ply:
+                    key = (board.hash, encode_move(move))
+                    weights[key] = weights.get(key, 0) + result_weight(result, board.turn)
+                board.make_move(move)
+                board.change_turns()
+            games += 1
+    count = 0
+    with open(output, "wb") as book:
+        for (key, move), weight in sorted(weights.items()):
+            if weight >= min_weight:
+                book.write(entry.pack(key, move, min(weight, max_weight)))
+                count += 1
+    print(f"{games} games, {count} book entries written to {output}")
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputs", nargs="+", help=".pgn files or self-play .jsonl logs")
+    parser.add_argument("--output", default="book.bin")
+    parser.add_argument("--plies", type=int, default=20)
+    parser.add_argument("--min-weight", type=int, default=1)
+    args = parser.parse_args()
+    build(args.inputs, args.output, args.plies, args.min_weight)
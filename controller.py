@@ -0,0 +1,59 @@
+import threading
+from bitboard import BitBoard
+
+def copy_board(board):
+    return BitBoard.unpack(board.pack()) if isinstance(board, BitBoard) else BitBoard.from_board(board)
+
+class SearchController:
+    def __init__(self, opponent):
+        self.opponent = opponent
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.search = None
+        self.result = None
+        self.pondered_hash = None
+
+    def start(self, board, depth=0, time_limit=None, node_limit=None):
+        self.stop()
+        self.stop_event = threading.Event()
+        self.result = None
+        self.pondered_hash = None
+        search_board = copy_board(board)
+        instant_move = self.opponent.instant_move(search_board)
+        if instant_move is not None:
+            self.search = None
+            self.result = (instant_move, 0, [instant_move])
+            return
+        self.search = self.opponent.search(search_board, depth, time_limit, node_limit, self.stop_event)
+        self.thread = threading.Thread(target=self._run, args=(self.search,), daemon=True)
+        self.thread.start()
+
+    def _run(self, search):
+        self.result = search.iterative_deepening()
+
+    def ponder(self, board, expected_move):
+        ponder_board = copy_board(board)
+        if expected_move not in ponder_board.get_all_valid_moves():
+            return
+        ponder_board.make_move(expected_move)
+        ponder_board.change_turns()
+        self.start(ponder_board, depth=None, time_limit=float("inf"), node_limit=float("inf"))
+        self.pondered_hash = ponder_board.hash
+
+    def ponder_hit(self, board):
+        return self.pondered_hash is not None and self.pondered_hash == copy_board(board).hash
+
+    def thinking(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.result
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        return self.result
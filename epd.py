@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from board import Board
+from bitboard import BitBoard
+from notation import parse_san, uci_name
+from opponent import Opponent
+
+analyser = {}
+
+def parse_epd(line):
+    fields = line.split(None, 4)
+    operations = {}
+    for operation in (fields[4] if len(fields) > 4 else "").split(";"):
+        operation = operation.strip()
+        if operation:
+            opcode, _, operands = operation.partition(" ")
+            operations[opcode] = operands.strip().strip('"')
+    halfmove_clock = operations.get("hmvc", "0")
+    fullmove_number = operations.get("fmvn", "1")
+    return " ".join(fields[:4] + [halfmove_clock, fullmove_number]), operations
+
+def init_worker(depth, time_limit, hash_size):
+    analyser["opponent"] = Opponent(depth=depth, hash_size=hash_size, time_limit=time_limit)
+
+def analyse(number, line):
+    fen, operations = parse_epd(line)
+    try:
+        board = BitBoard.from_board(Board(fen=fen))
+    except (ValueError, KeyError, IndexError):
+        return {"line": number, "fen": fen, "error": "invalid position"}
+    search = analyser["opponent"].search(board)
+    start = time.perf_counter()
+    move, score, _ = search.iterative_deepening()
+    record = {"line": number, "fen": fen, "move": None if move is None else uci_name(board, move), "score": score,
+        "depth": search.completed_depth, "nodes": search.nodes, "time": round(time.perf_counter() - start, 3)}
+    if "id" in operations:
+        record["id"] = operations["id"]
+    if move is not None and ("bm" in operations or "am" in operations):
+        try:
+            best = [parse_san(board, san) for san in operations.get("bm", "").split()]
+            avoid = [parse_san(board, san) for san in operations.get("am", "").split()]
+        except (ValueError, KeyError, IndexError):
+            record["error"] = "invalid solution"
+            return record
+        record["solved"] = (not best or move in best) and move not in avoid
+    return record
+
+def run(input_path, output, depth=4, time_limit=None, workers=1, hash_size=16):
+    solved, scored, count = 0, 0, 0
+    # only a few positions per worker are in flight, so memory does not grow with the file
+    window = deque()
+    with open(input_path) as positions, open(output, "w") as results, \
+            ProcessPoolExecutor(workers, initializer=init_worker, initargs=(depth, time_limit, hash_size)) as executor:
+
+        def write(record):
+            nonlocal solved, scored, count
+            count += 1
+            if "solved" in record:
+                scored += 1
+                solved += record["solved"]
+            results.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+        for number, line in enumerate(positions, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            window.append(executor.submit(analyse, number, line))
+            if len(window) >= workers * 2:
+                write(window.popleft().result())
+        while window:
+            write(window.popleft().result())
+    print(f"{count} positions analysed" + (f", {solved}/{scored} solved" if scored else ""))
+    return solved, scored
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("--output", default="analysis.jsonl")
+    parser.add_argument("--depth", type=int)
+    parser.add_argument("--time", type=float, help="seconds per position, searching as deep as the time allows")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--hash-size", type=int, default=16)
+    args = parser.parse_args()
+    depth = args.depth if args.depth is not None else None if args.time else 4
+    run(args.input, args.output, depth, args.time, args.workers, args.hash_size)
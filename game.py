@@ -1,51 +1,92 @@
-import turtle
 import math
+import os
+import turtle
 from board import Board
 from players import Players
 from opponent import Opponent
-from pieces import piece_values
-from copy import deepcopy
-turtle.tracer(0)
+from controller import SearchController
+from gui import BoardView
+from sprites import piece_sprites
 
 width, height = 800, 800
 square_size = width/8
 player_color = Players.BLACK
 
-screen = turtle.Screen()
-screen.setup(width, height)
-screen.setworldcoordinates(0, height+10, width+10, 0)
-screen.cv._rootwindow.resizable(False, False)
-
-pen = turtle.Turtle()
-pieces = list(piece_values[Players.WHITE].values()) + list(piece_values[Players.BLACK].values())
-for piece in pieces:
-    screen.addshape(piece)
-
-board = Board(square_size)
-opponent = Opponent()
-
-def get_mouse_click_coor(x, y):
-    row = math.floor(y/square_size)
-    col = math.floor(x/square_size)
-    if row < 0 or row > 7 or col < 0 or col > 7:
-        return
-    square_changes = deepcopy(board).board
-    moved,_ = board.handle_clicks(row, col, pen)
-    if moved:
-        board.draw_board(pen, square_changes=board.get_changed_squares(square_changes))
-        board.change_turns()
-        square_changes = deepcopy(board).board
-        board.check_draw_and_mate(pen)
-        opponent.make_move(board)
-        board.change_turns()
-        board.draw_board(pen, square_changes=board.get_changed_squares(square_changes))
-        board.check_draw_and_mate(pen)
+think_time = 2
+poll_interval = 50
+book_path = "book.bin"
+tablebase_directory = "tablebases"
 
-if __name__ == "__main__":
+class Game:
+    def __init__(self, screen, pen):
+        self.screen = screen
+        self.board = Board()
+        self.view = BoardView(self.board, pen, square_size)
+        self.opponent = Opponent(depth=None, book=book_path if os.path.exists(book_path) else None,
+            tablebases=tablebase_directory if os.path.isdir(tablebase_directory) else None)
+        self.controller = SearchController(self.opponent)
+        # set from the human's move until the reply is on the board, the controller may have finished before then
+        self.engine_to_move = False
+
+    def get_mouse_click_coor(self, x, y):
+        row = math.floor(y/square_size)
+        col = math.floor(x/square_size)
+        if row < 0 or row > 7 or col < 0 or col > 7:
+            return
+        if self.engine_to_move:
+            return
+        controller = self.controller
+        moved,_ = self.view.handle_clicks(row, col)
+        if moved:
+            self.view.draw_board(self.board.changed_squares)
+            self.board.change_turns()
+            self.view.check_draw_and_mate()
+            # a correctly predicted reply leaves the table warm from pondering
+            time_limit = think_time/2 if controller.ponder_hit(self.board) else think_time
+            controller.stop()
+            self.engine_to_move = True
+            controller.start(self.board, time_limit=time_limit)
+            self.screen.ontimer(self.wait_for_opponent, poll_interval)
+
+    def wait_for_opponent(self):
+        controller = self.controller
+        if controller.thinking():
+            self.screen.ontimer(self.wait_for_opponent, poll_interval)
+            return
+        best_move, _, pv = controller.result
+        moved, explanation = self.board.move(*best_move)
+        if not moved:
+            print(f"Engine move rejected: {explanation}")
+            controller.start(self.board, time_limit=think_time)
+            self.screen.ontimer(self.wait_for_opponent, poll_interval)
+            return
+        self.engine_to_move = False
+        self.board.change_turns()
+        self.view.draw_board(self.board.changed_squares)
+        self.view.check_draw_and_mate()
+        if len(pv) > 1:
+            controller.ponder(self.board, pv[1])
+
+def main():
+    # the window is only opened when the game runs, importing this module stays headless
+    turtle.tracer(0)
+    screen = turtle.Screen()
+    screen.setup(width, height)
+    screen.setworldcoordinates(0, height+10, width+10, 0)
+    screen.cv._rootwindow.resizable(False, False)
+    pen = turtle.Turtle()
+    for sprites in piece_sprites.values():
+        for piece in sprites.values():
+            screen.addshape(piece)
+
+    game = Game(screen, pen)
     if player_color == Players.BLACK:
-        board.change_turns()
-    board.draw_board(pen)
-    screen.onscreenclick(get_mouse_click_coor)
+        game.board.change_turns()
+    game.view.draw_board()
+    screen.onscreenclick(game.get_mouse_click_coor)
     turtle.mainloop()
 
-# TODO: clean code - optimize move gen and bot
\ No newline at end of file
+if __name__ == "__main__":
+    main()
+
+# TODO: clean code - optimize move gen and bot
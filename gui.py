@@ -0,0 +1,136 @@
+from players import Players
+from sprites import sprite
+
+class BoardView:
+    def __init__(self, board, pen, square_size=100):
+        self.board = board
+        self.pen = pen
+        self.square_size = square_size
+        self.black_square_color = (0.5,0.65,0.3)
+        self.white_square_color = (0.9, 0.9, 0.8)
+        self.border_color = (0, 0, 0)
+        self.selected_color = (1, 0, 0)
+        self.highlighted_squares = []
+        self.selected = None
+        self.stamps = {}
+        self.drawn_flipped = None
+
+    def _draw_square(self, white, x, y):
+        pen = self.pen
+        pen.up()
+        pen.goto(x, y)
+        pen.down()
+        color = self.white_square_color if white else self.black_square_color
+        pen.fillcolor(color)
+        pen.pencolor(self.border_color)
+        pen.begin_fill()
+        for _ in range(4):
+            pen.forward(self.square_size)
+            pen.right(360 / 4)
+        pen.end_fill()
+
+    def _draw_piece(self, x, y, piece):
+        pen = self.pen
+        pen.up()
+        pen.goto(x, y)
+        pen.down()
+        pen.shape(sprite(piece))
+        stamp = pen.stamp()
+        pen.ht()
+        return stamp
+
+    def _highlight(self, color, square):
+        pen = self.pen
+        if self.board.turn == Players.BLACK:
+            square = (7-square[0], 7-square[1])
+        x, y = 1+self.square_size*square[1], self.square_size+self.square_size*square[0]
+        pen.pencolor(color)
+        pen.up()
+        pen.goto(x, y)
+        pen.down()
+        for _ in range(4):
+            pen.forward(self.square_size)
+            pen.right(360 / 4)
+
+    def handle_clicks(self, row, col):
+        board = self.board
+        row, col = 7-row if board.turn == Players.BLACK else row, 7-col if board.turn == Players.BLACK else col
+        return_value = None
+        if len(self.highlighted_squares) > 0:
+            self._highlight(color=self.border_color, square=self.selected)
+            for square in self.highlighted_squares:
+                if (row, col) == square:
+                    return_value = board.move(self.selected[0], self.selected[1], row, col)
+                self._highlight(color=self.border_color, square=square)
+        self.highlighted_squares = []
+        if return_value is not None:
+            self.selected = None
+            return return_value
+        value = board.get_value(row, col)
+        if value == 0:
+            return False, ""
+        if (board.turn == Players.WHITE and not value.white) or (board.turn == Players.BLACK and value.white):
+            return False, ""
+        self.selected = (row, col)
+        for move in value.get_all_valid_moves(row, col, board)+[(row, col)]:
+            self.highlighted_squares.append(move)
+            self._highlight(square=move, color=self.selected_color)
+        self.pen.getscreen().update()
+        return False, ""
+
+    def _screen_position(self, row, col):
+        if self.drawn_flipped:
+            row, col = 7-row, 7-col
+        return 1 + self.square_size*col, self.square_size + self.square_size*row
+
+    def _draw_stamp(self, row, col):
+        # a square keeps its stamp while the same sprite stands on it
+        value = self.board.get_value(row, col)
+        shape = sprite(value) if value != 0 else None
+        drawn = self.stamps.get((row, col))
+        if drawn is not None and drawn[0] == shape:
+            return
+        if drawn is not None:
+            self.pen.clearstamp(drawn[1])
+            del self.stamps[(row, col)]
+        if shape is not None:
+            x, y = self._screen_position(row, col)
+            self.stamps[(row, col)] = shape, self._draw_piece(x+0.5*self.square_size, y-0.5*self.square_size, value)
+
+    def draw_board(self, squares=None):
+        flipped = self.board.turn == Players.BLACK
+        if squares is None or flipped != self.drawn_flipped:
+            self.pen.clearstamps()
+            self.stamps = {}
+            self.drawn_flipped = flipped
+            for row in range(8):
+                for col in range(8):
+                    self._draw_square((row+col) % 2 == 0, *self._screen_position(row, col))
+            squares = [(row, col) for row in range(8) for col in range(8)]
+        for row, col in squares:
+            self._draw_stamp(row, col)
+        self.pen.getscreen().update()
+
+    def display_text(self, text):
+        pen = self.pen
+        pen.up()
+        pen.goto(800/2-(20*len(text)), 800/2)
+        pen.down()
+        pen.pencolor(self.selected_color)
+        pen.write(text.upper(), font=("Arial", 50, "bold"))
+        pen.ht()
+        pen.getscreen().update()
+
+    def check_draw_and_mate(self):
+        board = self.board
+        status = board.game_status()
+        if status is None:
+            return
+        print(status.capitalize())
+        if status == "checkmate":
+            winner = Players.BLACK if board.turn == Players.WHITE else Players.WHITE
+            self.display_text(f"{winner.value.lower().capitalize()} won!")
+        else:
+            self.display_text("A draw!")
+        self.pen.getscreen().mainloop()
+        quit()
@@ -0,0 +1,69 @@
+from bitboard import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+files = "abcdefgh"
+promotion_letters = {"queen": "q", "rook": "r", "bishop": "b", "knight": "n"}
+letter_promotions = {letter: name for name, letter in promotion_letters.items()}
+san_pieces = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+
+def square_name(row, col):
+    return f"{files[col]}{8-row}"
+
+def parse_square(name):
+    return 8 - int(name[1]), files.index(name[0])
+
+def move_name(move):
+    name = square_name(move[0], move[1]) + square_name(move[2], move[3])
+    return name + promotion_letters[move[4]] if len(move) > 4 else name
+
+def parse_move(name):
+    move = parse_square(name[:2]) + parse_square(name[2:4])
+    return move + (letter_promotions[name[4]],) if len(name) > 4 else move
+
+def parse_san(board, san):
+    san = san.rstrip("+#!?")
+    moves = board.get_all_valid_moves()
+    if san in ("O-O", "O-O-O", "0-0", "0-0-0"):
+        # castling is stored as the king moving onto its own rook
+        rook_col = 7 if len(san) == 3 else 0
+        for move in moves:
+            if board.squares[move[0]*8 + move[1]] % 6 == KING and move[1] == 4 and move[3] == rook_col and move[0] == move[2]:
+                return move
+        raise ValueError(f"illegal move {san}")
+
+    promotion = None
+    if "=" in san:
+        san, letter = san.split("=")
+        promotion = letter_promotions[letter.lower()]
+    piece_type = san_pieces.get(san[0], PAWN)
+    if piece_type != PAWN:
+        san = san[1:]
+    san = san.replace("x", "")
+    target, hint = parse_square(san[-2:]), san[:-2]
+    for move in moves:
+        code = board.squares[move[0]*8 + move[1]]
+        if move[2:4] != target or code % 6 != piece_type:
+            continue
+        if (move[4] if len(move) > 4 else None) != promotion:
+            continue
+        captured = board.squares[move[2]*8 + move[3]]
+        if captured is not None and captured // 6 == code // 6:
+            continue
+        start = square_name(move[0], move[1])
+        if all(char in start for char in hint):
+            return move
+    raise ValueError(f"illegal move {san}")
+
+def uci_name(board, move):
+    # castling is stored as the king taking its own rook, UCI moves the king two files instead
+    code = board.squares[move[0]*8 + move[1]]
+    captured = board.squares[move[2]*8 + move[3]]
+    if code % 6 == KING and captured is not None and captured // 6 == code // 6:
+        return square_name(move[0], move[1]) + square_name(move[2], 6 if move[3] > move[1] else 2)
+    return move_name(move)
+
+def parse_uci(board, name):
+    move = parse_move(name)
+    code = board.squares[move[0]*8 + move[1]]
+    if code is not None and code % 6 == KING and abs(move[3] - move[1]) == 2:
+        return move[:3] + (7 if move[3] > move[1] else 0,)
+    return move
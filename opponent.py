@@ -1,78 +1,497 @@
-from copy import deepcopy
+import time
+from bitboard import BitBoard
+from book import OpeningBook
+from evaluation import worths
+from pawns import PawnTable
+from pieces import piece_types
+from players import Players
+from stats import SearchStats
+from tablebase import Tablebases
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
 
-class Node:
-    def __init__(self, data):
-        self.data = data
-        self.children = []
-        self.parent = None
-    
-    def add_child(self, child_node):
-        child_node.parent = self
-        self.children.append(child_node)
-    
-    def get_level(self):
-        level = 0
-        parent = self.parent
-        while parent:
-            level += 1
-            parent = parent.parent
-        return level
-
-    def print_tree(self, max_level=10000):
-        if self.get_level() > max_level:
-            return
-        print(f"{self.get_level()*'   ' + '|__'}{self.data}")
-        for child in self.children:
-            child.print_tree(max_level)
-    
-    def __repr__(self):
-        return str(self.data)
-    
-class Tree:
-    def __init__(self, board, depth=3):
-        self.root = Node({(0,0,0,0):board.evaluate_position(board.turn)})
+mate_score = 100000
+mate_threshold = mate_score - 1000
+max_depth = 64
+# captures past this many plies below the horizon are left to the static evaluation
+quiescence_depth = 8
+delta_margin = 200
+history_limit = 1000000
+# seconds between checks of the limits while root moves are searched in other processes
+poll_interval = 0.01
+promotion_gains = {name: worth - worths[0] for name, worth in zip(piece_types, worths)}
+
+class SearchStopped(Exception):
+    pass
+
+def score_to_table(score, ply):
+    if score > mate_threshold:
+        return score + ply
+    if score < -mate_threshold:
+        return score - ply
+    return score
+
+def score_from_table(score, ply):
+    if score > mate_threshold:
+        return score - ply
+    if score < -mate_threshold:
+        return score + ply
+    return score
+
+class Search:
+    def __init__(self, board, depth=3, table=None, time_limit=None, node_limit=None, stop_event=None, tablebases=None, report=None, batch_leaves=False, pawn_table=None):
         self.board = board
         self.depth = depth
-        self.construct_tree()
-    
-    def construct_tree(self, node=None, depth=None, board=None):
-        if node is None:
-            node = self.root
-            depth = 1
-            board = self.board
-        if depth < self.depth:
-            depth += 1
-            all_valid_moves = deepcopy(board).get_all_valid_moves()
-            for move in all_valid_moves:
-                test_board = deepcopy(board)
-                test_board.move(*move)
-                new_node = Node({move:test_board.evaluate_position(test_board.turn)})
-                test_board.change_turns()
-                self.construct_tree(new_node, depth, test_board)
-                node.add_child(new_node)
-    
-    def pick_best_move(self, node=None):
-        if node is None:
-            node = self.root
-        for child in node.children:
-            if child.children:
-                self.pick_best_move(child)
-            else:
-                try:
-                    node.data[list(node.data.keys())[0]] = -(max(list(child.data.values())[0] for child in node.children))
+        self.table = table if table is not None else TranspositionTable()
+        self.pawn_table = pawn_table if pawn_table is not None else PawnTable()
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.stop_event = stop_event
+        self.tablebases = tablebases
+        self.report = report
+        self.deadline = None
+        self.checking_limits = False
+        self.completed_depth = 0
+        self.root_best = None
+        self.killers = [[None, None] for _ in range(max_depth+quiescence_depth+1)]
+        self.history = [0] * (2*64*64)
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.evaluations = 0
+        self.tablebase_hits = 0
+        self.depth_nodes = []
+        self.batch = None
+        self.batching = False
+        if batch_leaves:
+            # numpy is slow to import, so it is only loaded by searches that batch their leaves
+            import batch_evaluation
+            self.batch = batch_evaluation
+            # without numpy a batch is scored one position at a time, so collecting leaves only adds work
+            self.batching = batch_evaluation.numpy is not None
+
+    def evaluate(self):
+        self.evaluations += 1
+        if self.batch is not None:
+            return self.batch.evaluate_encoded(self.board.encode())
+        board = self.board
+        pawns = self.pawn_table.score(board)
+        return board.evaluate_position(board.turn) + (pawns if board.turn == Players.WHITE else -pawns)
+
+    def collect_leaves(self, moves):
+        # children are scored in one batch, their quiescence searches take these as the static evaluation
+        position = self.board.encode()
+        children = [self.batch.encode_child(position, move) for move in moves]
+        self.evaluations += len(children)
+        return dict(zip(moves, self.batch.evaluate_batch(children)))
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def history_index(self, move):
+        side = 0 if self.board.turn == Players.WHITE else 1
+        return side*4096 + (move[0]*8 + move[1])*64 + move[2]*8 + move[3]
+
+    def capture_score(self, move):
+        victim, attacker = self.board.capture_values(move)
+        if len(move) > 4:
+            victim += promotion_gains[move[4]]
+        return victim*100 - attacker
+
+    def capture_gain(self, move):
+        gain = self.board.capture_values(move)[0]
+        return gain + promotion_gains[move[4]] if len(move) > 4 else gain
+
+    def staged_moves(self, ply, hash_move, pv_move):
+        # moves are pseudo-legal, the caller rejects those that leave the king in check
+        board = self.board
+        tried = []
+        for move in (pv_move, hash_move):
+            if move is not None and move not in tried and board.is_pseudo_legal(move):
+                tried.append(move)
+                yield move
+        captures = board.get_pseudo_legal_captures()
+        captures.sort(key=self.capture_score, reverse=True)
+        for move in captures:
+            if move not in tried:
+                yield move
+        for move in self.killers[ply]:
+            if move is not None and move not in tried and board.is_pseudo_legal(move) and not board.capture_values(move)[0]:
+                tried.append(move)
+                yield move
+        quiets = board.get_pseudo_legal_quiets()
+        history = self.history
+        quiets.sort(key=lambda move: history[self.history_index(move)], reverse=True)
+        for move in quiets:
+            if move not in tried:
+                yield move
+
+    def record_cutoff(self, move, depth, ply, first):
+        self.cutoffs += 1
+        if first:
+            self.first_move_cutoffs += 1
+        if len(move) > 4 or self.board.capture_values(move)[0]:
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        index = self.history_index(move)
+        self.history[index] += depth*depth
+        if self.history[index] > history_limit:
+            self.history = [value // 2 for value in self.history]
+
+    def check_limits(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchStopped
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchStopped
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchStopped
+
+    def iterative_deepening(self):
+        self.table.new_search()
+        if self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        best_move, score, pv = None, 0, []
+        # depth 1 always completes so there is a move to play however tight the limits are
+        for depth in range(1, min(self.depth or max_depth, max_depth)+1):
+            self.checking_limits = depth > 1
+            self.root_best = None
+            try:
+                score, pv = self.negamax(depth, float("-inf"), float("inf"), 0, pv)
+            except SearchStopped:
+                if self.root_best is not None:
+                    score, pv = self.root_best
+                    best_move = pv[0]
+                break
+            self.completed_depth = depth
+            self.depth_nodes.append(self.nodes)
+            if pv:
+                best_move = pv[0]
+            if self.report is not None:
+                self.report(depth, score, pv, self.nodes)
+        return best_move, score, pv
+
+    def negamax(self, depth, alpha, beta, ply, pv_line=(), static_score=None):
+        if self.tablebases is not None and ply > 0:
+            result = self.tablebases.probe(self.board)
+            if result is not None:
+                self.tablebase_hits += 1
+                sign, plies = result
+                return (sign * (mate_score - ply - plies) if sign else 0), []
+        if depth == 0:
+            return self.quiescence(alpha, beta, ply, 0, static_score)
+        board = self.board
+        self.nodes += 1
+        if self.checking_limits and self.nodes % 256 == 0:
+            self.check_limits()
+        if ply > 0 and board.no_captures_or_pawn_moves[Players.WHITE] >= 50 and board.no_captures_or_pawn_moves[Players.BLACK] >= 50:
+            return 0, []
+
+        original_alpha = alpha
+        hash_move = None
+        entry = self.table.probe(board.hash)
+        if entry is not None:
+            entry_depth, entry_score, bound, hash_move = entry
+            entry_score = score_from_table(entry_score, ply)
+            if ply > 0 and entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_score, [hash_move] if hash_move else []
+                if bound == LOWER:
+                    alpha = max(alpha, entry_score)
+                elif bound == UPPER:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score, [hash_move] if hash_move else []
+
+        leaf_scores = None
+        best_pv = []
+        legal_moves = 0
+        for move in self.staged_moves(ply, hash_move, pv_line[0] if pv_line else None):
+            undo = board.make_move(move)
+            if board.in_check():
+                board.unmake_move(undo)
+                continue
+            legal_moves += 1
+            if legal_moves == 2 and depth == 1 and self.batching:
+                # the first move did not cut off, so the rest are likely all searched and worth scoring together
+                board.unmake_move(undo)
+                leaf_scores = self.collect_leaves(board.get_pseudo_legal_captures() + board.get_pseudo_legal_quiets())
+                undo = board.make_move(move)
+            board.change_turns()
+            try:
+                score, pv = self.negamax(depth-1, -beta, -alpha, ply+1, pv_line[1:] if pv_line and move == pv_line[0] else (),
+                    None if leaf_scores is None else leaf_scores.get(move))
+            finally:
+                board.change_turns()
+                board.unmake_move(undo)
+            score = -score
+            if score > alpha:
+                alpha = score
+                best_pv = [move] + pv
+                if ply == 0:
+                    self.root_best = (alpha, best_pv)
+                if alpha >= beta:
+                    self.record_cutoff(move, depth, ply, legal_moves == 1)
                     break
-                except AttributeError:
-                    self.root.print_tree(1)
-                    print(node.data)
-                    print(child.children)
-                    quit()
+        if legal_moves == 0:
+            return (-mate_score + ply if board.in_check() else 0), []
+
+        if alpha <= original_alpha:
+            bound = UPPER
+        elif alpha >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(board.hash, depth, score_to_table(alpha, ply), bound, best_pv[0] if best_pv else hash_move)
+        return alpha, best_pv
+
+    def quiescence(self, alpha, beta, ply, qdepth, static_score=None):
+        board = self.board
+        self.nodes += 1
+        self.quiescence_nodes += 1
+        if self.checking_limits and self.nodes % 256 == 0:
+            self.check_limits()
+        stand_pat = self.evaluate() if static_score is None else static_score
+        if stand_pat >= beta:
+            return stand_pat, []
+        if stand_pat > alpha:
+            alpha = stand_pat
+        if qdepth >= quiescence_depth:
+            return alpha, []
+
+        moves = board.get_pseudo_legal_captures()
+        moves.sort(key=self.capture_score, reverse=True)
+        leaf_scores = None
+        searched = 0
+        best_pv = []
+        for index, move in enumerate(moves):
+            # even winning this material back cannot lift the score to alpha
+            if stand_pat + self.capture_gain(move) + delta_margin <= alpha:
+                continue
+            searched += 1
+            if searched == 2 and self.batching:
+                leaf_scores = self.collect_leaves([move for move in moves[index:] if stand_pat + self.capture_gain(move) + delta_margin > alpha])
+            undo = board.make_move(move)
+            if board.in_check():
+                board.unmake_move(undo)
+                continue
+            board.change_turns()
+            try:
+                score, pv = self.quiescence(-beta, -alpha, ply+1, qdepth+1, None if leaf_scores is None else leaf_scores.get(move))
+            finally:
+                board.change_turns()
+                board.unmake_move(undo)
+            score = -score
+            if score > alpha:
+                alpha = score
+                best_pv = [move] + pv
+                if alpha >= beta:
+                    break
+        return alpha, best_pv
+
+worker_table = None
+worker_pawn_table = None
+worker_tablebases = None
+worker_batch_leaves = False
+worker_stop_event = None
+
+def to_bitboard(board):
+    return board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+
+def init_worker(hash_size, tablebase_directory=None, batch_leaves=False, stop_event=None):
+    global worker_table, worker_pawn_table, worker_tablebases, worker_batch_leaves, worker_stop_event
+    worker_table = TranspositionTable(hash_size)
+    worker_pawn_table = PawnTable()
+    worker_tablebases = Tablebases(tablebase_directory) if tablebase_directory else None
+    worker_batch_leaves = batch_leaves
+    worker_stop_event = stop_event
+
+def search_root_move(packed_board, move, depth, alpha, time_limit=None, node_limit=None):
+    board = BitBoard.unpack(packed_board)
+    board.make_move(move)
+    board.change_turns()
+    search = Search(board, depth=depth, table=worker_table, node_limit=node_limit, stop_event=worker_stop_event,
+        tablebases=worker_tablebases, batch_leaves=worker_batch_leaves, pawn_table=worker_pawn_table)
+    # like the serial search, depth 1 always completes so there is a move to play
+    search.checking_limits = depth > 1
+    if time_limit is not None:
+        search.deadline = time.perf_counter() + time_limit
+    try:
+        score, pv = search.negamax(depth-1, float("-inf"), -alpha, 1)
+    except SearchStopped:
+        return None, [move], search.nodes
+    return -score, [move] + pv, search.nodes
+
+class ParallelSearch:
+    def __init__(self, board, executor, depth=3, time_limit=None, node_limit=None, stop_event=None, report=None, worker_stop=None):
+        self.board = board
+        self.executor = executor
+        self.depth = depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.stop_event = stop_event
+        self.report = report
+        # shared with the worker processes, setting it makes their searches stop
+        self.worker_stop = worker_stop
+        self.completed_depth = 0
+        self.nodes = 0
+        self.depth_nodes = []
+
+    def out_of_budget(self, started):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.time_limit is not None and time.perf_counter() - started >= self.time_limit
+
+    def submit(self, packed_board, move, depth, alpha, started):
+        time_limit = None if self.time_limit is None else self.time_limit - (time.perf_counter() - started)
+        node_limit = None if self.node_limit is None else self.node_limit - self.nodes
+        return self.executor.submit(search_root_move, packed_board, move, depth, alpha, time_limit, node_limit)
+
+    def collect(self, futures, depth, started):
+        # results in submission order, None for moves whose search was stopped or never started
+        from concurrent.futures import wait, FIRST_COMPLETED
+        results = dict.fromkeys(futures)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            if pending and depth > 1 and self.out_of_budget(started):
+                for future in pending:
+                    future.cancel()
+                running = [future for future in pending if not future.cancelled()]
+                if self.worker_stop is not None:
+                    self.worker_stop.set()
+                wait(running)
+                if self.worker_stop is not None:
+                    self.worker_stop.clear()
+                done, pending = done | set(running), set()
+            for future in done:
+                score, pv, nodes = future.result()
+                self.nodes += nodes
+                if score is not None:
+                    results[future] = score, pv, nodes
+        return [results[future] for future in futures]
+
+    def iterative_deepening(self):
+        started = time.perf_counter()
+        packed_board = self.board.pack()
+        moves = self.board.get_all_valid_moves()
+        best_move, score, pv = None, 0, []
+        if not moves:
+            return best_move, score, pv
+        for depth in range(1, min(self.depth or max_depth, max_depth)+1):
+            if depth > 1 and self.out_of_budget(started):
+                break
+            # the first move sets the bound the remaining root moves are searched against
+            first = self.collect([self.submit(packed_board, moves[0], depth, float("-inf"), started)], depth, started)[0]
+            if first is None:
+                break
+            futures = [self.submit(packed_board, move, depth, first[0], started) for move in moves[1:]]
+            results = [first] + self.collect(futures, depth, started)
+            if None in results:
+                # the previous best is searched first, so the moves a stopped iteration finished are still worth playing
+                finished = [result for result in results if result is not None]
+                score, pv, _ = max(finished, key=lambda result: result[0])
+                best_move = pv[0]
+                break
+            score, pv, _ = max(results, key=lambda result: result[0])
+            best_move = pv[0]
+            order = sorted(range(len(moves)), key=lambda index: -results[index][0])
+            moves = [moves[index] for index in order]
+            self.completed_depth = depth
+            self.depth_nodes.append(self.nodes)
+            if self.report is not None:
+                self.report(depth, score, pv, self.nodes)
+        return best_move, score, pv
 
 class Opponent:
-    def __init__(self, depth=3):
+    def __init__(self, depth=4, bitboard=True, hash_size=16, workers=1, time_limit=None, node_limit=None, book=None, tablebases=None, batch_leaves=False):
         self.depth = depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.bitboard = bitboard
+        self.hash_size = hash_size
+        self.workers = workers
+        self.table = TranspositionTable(hash_size)
+        # pawn structure scores do not depend on the rest of the position, so they carry over between moves
+        self.pawn_table = PawnTable()
+        self.executor = None
+        self.worker_stop = None
+        self.book = OpeningBook(book) if book else None
+        self.tablebase_directory = tablebases
+        self.tablebases = Tablebases(tablebases) if tablebases else None
+        self.batch_leaves = batch_leaves
+        self.stats = None
+
+    def instant_move(self, board):
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                return move
+        if self.tablebases is not None:
+            return self.tablebases.best_move(board)
+        return None
+
+    def search(self, board, depth=0, time_limit=None, node_limit=None, stop_event=None, report=None):
+        limits = {
+            "depth": self.depth if depth == 0 else depth,
+            "time_limit": self.time_limit if time_limit is None else time_limit,
+            "node_limit": self.node_limit if node_limit is None else node_limit,
+            "stop_event": stop_event,
+            "report": report,
+        }
+        if self.workers > 1:
+            if self.executor is None:
+                # the process pool machinery is only loaded once a parallel search needs it
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self.worker_stop = multiprocessing.Event()
+                self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                    initargs=(self.hash_size, self.tablebase_directory, self.batch_leaves, self.worker_stop))
+            return ParallelSearch(to_bitboard(board), self.executor, worker_stop=self.worker_stop, **limits)
+        search_board = to_bitboard(board) if self.bitboard else board
+        return Search(search_board, table=self.table, tablebases=self.tablebases, batch_leaves=self.batch_leaves,
+            pawn_table=self.pawn_table, **limits)
     
-    def make_move(self, board):
-        tree = Tree(board, depth=self.depth)
-        tree.pick_best_move()
-        move = list(max([child.data for child in tree.root.children], key=lambda x: max(x.values())).keys())[0]
-        board.move(*move)
+    def make_move(self, board, depth=0, time_limit=None, node_limit=None, profile=False):
+        best_move = self.instant_move(board)
+        if best_move is not None:
+            self.stats = None
+            board.move(*best_move)
+            return best_move, 0, [best_move]
+        search = self.search(board, depth, time_limit, node_limit)
+        probes, hits = self.table.probes, self.table.hits
+        pawn_probes, pawn_hits = self.pawn_table.probes, self.pawn_table.hits
+        profiler = None
+        if profile:
+            import cProfile
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            best_move, score, pv = search.iterative_deepening()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+        counters = {}
+        # worker processes probe their own tables, so only a serial search is seen in these
+        if isinstance(search, Search):
+            counters = {"table_probes": self.table.probes - probes, "table_hits": self.table.hits - hits,
+                "pawn_probes": self.pawn_table.probes - pawn_probes, "pawn_hits": self.pawn_table.hits - pawn_hits}
+        self.stats = SearchStats(search, best_move, score, elapsed, profile=profiler, **counters)
+        if best_move is not None:
+            board.move(*best_move)
+        return best_move, score, pv
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
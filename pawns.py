@@ -0,0 +1,58 @@
+from array import array
+
+doubled_penalty = 15
+isolated_penalty = 12
+# indexed by how many ranks the pawn has advanced from its starting rank
+passed_bonus = [0, 10, 15, 25, 40, 65, 100, 0]
+# each slot is a 64-bit pawn key plus a 32-bit score
+entry_size = 12
+
+def side_structure(pawns, enemy_pawns, white):
+    counts = [0]*8
+    for square in pawns:
+        counts[square % 8] += 1
+    enemy_rows = [[] for _ in range(8)]
+    for square in enemy_pawns:
+        enemy_rows[square % 8].append(square // 8)
+    score = -doubled_penalty * sum(count - 1 for count in counts if count > 1)
+    for square in pawns:
+        row, col = divmod(square, 8)
+        files = range(max(col-1, 0), min(col+2, 8))
+        if not any(counts[file] for file in files if file != col):
+            score -= isolated_penalty
+        # white pawns move towards row 0
+        if white and not any(enemy_row < row for file in files for enemy_row in enemy_rows[file]):
+            score += passed_bonus[6 - row]
+        elif not white and not any(enemy_row > row for file in files for enemy_row in enemy_rows[file]):
+            score += passed_bonus[row - 1]
+    return score
+
+def pawn_structure(white_pawns, black_pawns):
+    # doubled, isolated and passed pawn terms from white's point of view
+    return side_structure(white_pawns, black_pawns, True) - side_structure(black_pawns, white_pawns, False)
+
+class PawnTable:
+    def __init__(self, size_mb=1):
+        self.size = max(1, int(size_mb * 1024 * 1024) // entry_size)
+        self.keys = array("Q", [0]) * self.size
+        self.scores = array("i", [0]) * self.size
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.keys = array("Q", [0]) * self.size
+        self.scores = array("i", [0]) * self.size
+
+    def score(self, board):
+        # the pawns change rarely, so most positions find their structure already scored,
+        # a new skeleton always replaces whatever shared its slot
+        self.probes += 1
+        key = board.pawn_hash
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.scores[index]
+        score = pawn_structure(*board.pawn_squares())
+        self.keys[index] = key
+        self.scores[index] = score
+        return score
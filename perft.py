@@ -0,0 +1,68 @@
+import argparse
+import time
+from board import Board
+from bitboard import BitBoard
+from notation import move_name
+
+positions = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902, 197281, 4865609]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    "endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    "promotions": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    "checks": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    "middlegame": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+}
+
+backends = {
+    "board": lambda fen: Board(fen=fen),
+    "bitboard": lambda fen: BitBoard.from_board(Board(fen=fen)),
+}
+
+def perft(board, depth):
+    moves = board.get_all_valid_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        board.change_turns()
+        nodes += perft(board, depth-1)
+        board.change_turns()
+        board.unmake_move(undo)
+    return nodes
+
+def divide(board, depth):
+    counts = {}
+    for move in board.get_all_valid_moves():
+        undo = board.make_move(move)
+        board.change_turns()
+        counts[move] = perft(board, depth-1) if depth > 1 else 1
+        board.change_turns()
+        board.unmake_move(undo)
+    return counts
+
+def run(names, depth, backend, show_divide=False):
+    failures = 0
+    for name in names:
+        fen, expected = positions[name]
+        board = backends[backend](fen)
+        if show_divide:
+            for move, count in sorted(divide(board, depth).items(), key=lambda item: move_name(item[0])):
+                print(f"{move_name(move)}: {count}")
+        start = time.perf_counter()
+        nodes = perft(board, depth)
+        elapsed = time.perf_counter() - start
+        known = expected[depth-1] if depth <= len(expected) else None
+        status = "unknown" if known is None else "ok" if nodes == known else f"FAIL expected {known}"
+        failures += known is not None and nodes != known
+        print(f"{name:<11} depth {depth} {nodes:>9} nodes {elapsed:7.2f}s {nodes/max(elapsed, 1e-9):9.0f} nps {status}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("positions", nargs="*", default=list(positions))
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--backend", choices=list(backends), default="bitboard")
+    parser.add_argument("--divide", action="store_true")
+    args = parser.parse_args()
+    raise SystemExit(1 if run(args.positions, args.depth, args.backend, args.divide) else 0)
@@ -1,33 +1,19 @@
 from players import Players
 
-piece_values = {
-    Players.BLACK: {
-        "pawn": "pieces/black_pawn.gif",
-        "rook": "pieces/black_rook.gif",
-        "knight": "pieces/black_knight.gif",
-        "bishop": "pieces/black_bishop.gif",
-        "queen": "pieces/black_queen.gif",
-        "king": "pieces/black_king.gif",
-    },
-
-    Players.WHITE: {
-        "pawn": "pieces/white_pawn.gif",
-        "rook": "pieces/white_rook.gif",
-        "knight": "pieces/white_knight.gif",
-        "bishop": "pieces/white_bishop.gif",
-        "queen": "pieces/white_queen.gif",
-        "king": "pieces/white_king.gif",
-    },
-}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+piece_types = ["pawn", "knight", "bishop", "rook", "queen", "king"]
 
 class Piece: 
+    __slots__ = ("white", "piece_color", "first", "en_passantable")
+    name = None
+    type_index = None
+    worth = 0
+
     def __init__(self, row): 
         self.white = True if row > 3 else False
         self.piece_color = Players.WHITE if self.white else Players.BLACK
-        self.value = None
         self.first = True
         self.en_passantable = False
-        self.worth = 0
 
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         return True
@@ -42,16 +28,18 @@ class Piece:
         return valid_moves
     
     def __repr__(self):
-        return f"{self.__class__.__name__.lower()}_{'white' if self.white else 'black'}"
+        return f"{self.name}_{'white' if self.white else 'black'}"
 
 class Pawn(Piece):
-    def __init__(self, row):
-        super().__init__(row)
-        self.value = piece_values[self.piece_color]["pawn"]
-        self.worth = 100
+    __slots__ = ()
+    name = "pawn"
+    type_index = PAWN
+    worth = 100
     
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         difference = old_row-new_row if self.white else new_row-old_row
+        if difference not in (1, 2) or abs(old_col-new_col) > 1:
+            return False
         horizontals = board.get_horizontal(old_row, old_col)
         horizontal = horizontals[0] if self.white else horizontals[1]
         diagonals = board.get_diagonal(old_row, old_col)
@@ -80,10 +68,10 @@ class Pawn(Piece):
         return True
     
 class Rook(Piece):
-    def __init__(self, row):
-        super().__init__(row)
-        self.value = piece_values[self.piece_color]["rook"]
-        self.worth = 500
+    __slots__ = ()
+    name = "rook"
+    type_index = ROOK
+    worth = 500
     
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         directions = board.get_horizontal(old_row, old_col)
@@ -98,10 +86,10 @@ class Rook(Piece):
         return True
 
 class Knight(Piece):
-    def __init__(self, row):
-        super().__init__(row)
-        self.value = piece_values[self.piece_color]["knight"]
-        self.worth = 300
+    __slots__ = ()
+    name = "knight"
+    type_index = KNIGHT
+    worth = 300
     
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         row_dif = abs(old_row-new_row)
@@ -109,10 +97,10 @@ class Knight(Piece):
         return (row_dif == 2 and col_dif == 1) or (row_dif == 1 and col_dif == 2)
 
 class Bishop(Piece):
-    def __init__(self, row):
-        super().__init__(row)
-        self.value = piece_values[self.piece_color]["bishop"]
-        self.worth = 300
+    __slots__ = ()
+    name = "bishop"
+    type_index = BISHOP
+    worth = 300
     
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         directions = board.get_diagonal(old_row, old_col) # upper_left, upper_right, lower_left, lower_right
@@ -131,10 +119,10 @@ class Bishop(Piece):
         return True
 
 class Queen(Piece):
-    def __init__(self, row):
-        super().__init__(row)
-        self.value = piece_values[self.piece_color]["queen"]
-        self.worth = 800
+    __slots__ = ()
+    name = "queen"
+    type_index = QUEEN
+    worth = 800
     
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         horizontal_directions = board.get_horizontal(old_row, old_col)
@@ -163,9 +151,9 @@ class Queen(Piece):
         return True
 
 class King(Piece):
-    def __init__(self, row):
-        super().__init__(row)
-        self.value = piece_values[self.piece_color]["king"]
+    __slots__ = ()
+    name = "king"
+    type_index = KING
 
     def is_valid_move(self, old_row, old_col, new_row, new_col, board):
         row_dif = abs(old_row-new_row)
@@ -0,0 +1,23 @@
+from players import Players
+
+# game endings shared by both boards, which supply get_all_valid_moves, in_check,
+# insufficient_material, no_captures_or_pawn_moves, history and hash
+class GameRules:
+    def repetitions(self):
+        # positions from before the last capture or pawn move cannot come back
+        window = 2*min(self.no_captures_or_pawn_moves.values()) + 2
+        return 1 + self.history[-window:].count(self.hash)
+
+    def game_status(self):
+        if not self.get_all_valid_moves():
+            return "checkmate" if self.in_check() else "stalemate"
+        if self.insufficient_material():
+            return "insufficient material"
+        if self.no_captures_or_pawn_moves[Players.WHITE] >= 50 and self.no_captures_or_pawn_moves[Players.BLACK] >= 50:
+            return "fifty moves"
+        if self.repetitions() >= 3:
+            return "repetition"
+        return None
+
+    def draw(self):
+        return self.game_status() not in (None, "checkmate")
@@ -0,0 +1,129 @@
+import argparse
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bitboard import BitBoard
+from opponent import Opponent
+from notation import move_name
+from players import Players
+
+engines = {}
+
+def parse_engine(text):
+    settings = {}
+    for item in filter(None, text.split(",")):
+        key, value = item.split("=")
+        for kind in (int, float, str):
+            try:
+                settings[key] = kind(value)
+                break
+            except ValueError:
+                pass
+    return settings
+
+def init_worker(engine_a, engine_b):
+    engines["a"] = Opponent(**engine_a)
+    engines["b"] = Opponent(**engine_b)
+
+def play_game(game, opening_plies, max_plies, move_time, move_nodes, game_time, seed):
+    randomizer = random.Random(seed * 100003 + game // 2)
+    white, black = ("a", "b") if game % 2 == 0 else ("b", "a")
+    for engine in engines.values():
+        engine.table.clear()
+    board = BitBoard()
+    clocks = {Players.WHITE: 0.0, Players.BLACK: 0.0}
+    result, reason = "1/2-1/2", "max plies"
+    moves_played = []
+    for ply in range(max_plies+1):
+        status = board.game_status()
+        if status is not None:
+            reason = status
+            if status == "checkmate":
+                result = "0-1" if board.turn == Players.WHITE else "1-0"
+            break
+        if ply == max_plies:
+            break
+        if ply < opening_plies:
+            move = randomizer.choice(board.get_all_valid_moves())
+        else:
+            engine = engines[white if board.turn == Players.WHITE else black]
+            time_limit = move_time
+            if game_time is not None:
+                remaining = game_time - clocks[board.turn]
+                time_limit = remaining / 20 if time_limit is None else min(time_limit, remaining / 20)
+            start = time.perf_counter()
+            move = engine.instant_move(board)
+            if move is None:
+                move = engine.search(board, time_limit=time_limit, node_limit=move_nodes).iterative_deepening()[0]
+            clocks[board.turn] += time.perf_counter() - start
+            if game_time is not None and clocks[board.turn] > game_time:
+                result, reason = ("0-1" if board.turn == Players.WHITE else "1-0"), "time"
+                break
+        board.make_move(move)
+        board.change_turns()
+        moves_played.append(move_name(move))
+    return {"game": game, "white": white, "result": result, "reason": reason, "plies": len(moves_played),
+        "time": round(clocks[Players.WHITE] + clocks[Players.BLACK], 3), "opening_plies": opening_plies, "moves": moves_played}
+
+def score_for_a(record):
+    if record["result"] == "1/2-1/2":
+        return 0.5
+    white_won = record["result"] == "1-0"
+    return 1.0 if white_won == (record["white"] == "a") else 0.0
+
+def summarise(records):
+    wins = sum(score_for_a(record) == 1 for record in records)
+    draws = sum(score_for_a(record) == 0.5 for record in records)
+    losses = len(records) - wins - draws
+    games = len(records)
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score)**2 + draws * (0.5 - score)**2 + losses * score**2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return {"games": games, "wins": wins, "draws": draws, "losses": losses, "score": round(score, 4),
+        "elo": elo(score), "elo_low": elo(score - margin), "elo_high": elo(score + margin)}
+
+def elo(score):
+    if score <= 0:
+        return float("-inf")
+    if score >= 1:
+        return float("inf")
+    return round(-400 * math.log10(1 / score - 1), 1)
+
+def format_summary(summary):
+    return (f"{summary['games']} games +{summary['wins']} ={summary['draws']} -{summary['losses']} "
+        f"score {summary['score']:.3f} elo {summary['elo']} [{summary['elo_low']}, {summary['elo_high']}]")
+
+def run(engine_a, engine_b, games, workers, output, opening_plies=4, max_plies=300, move_time=None, move_nodes=None, game_time=None, seed=0, report_every=50):
+    records = []
+    with open(output, "w") as results, ProcessPoolExecutor(workers, initializer=init_worker, initargs=(engine_a, engine_b)) as executor:
+        futures = [executor.submit(play_game, game, opening_plies, max_plies, move_time, move_nodes, game_time, seed) for game in range(games)]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            results.write(json.dumps(record, separators=(",", ":")) + "\n")
+            results.flush()
+            if len(records) % report_every == 0:
+                print(format_summary(summarise(records)), flush=True)
+    summary = summarise(records)
+    print(format_summary(summary))
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine-a", type=parse_engine, default=parse_engine("depth=2,hash_size=4"))
+    parser.add_argument("--engine-b", type=parse_engine, default=parse_engine("depth=1,hash_size=4"))
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="selfplay.jsonl")
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument("--max-plies", type=int, default=300)
+    parser.add_argument("--move-time", type=float)
+    parser.add_argument("--move-nodes", type=int)
+    parser.add_argument("--game-time", type=float)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report-every", type=int, default=50)
+    args = parser.parse_args()
+    run(args.engine_a, args.engine_b, args.games, args.workers, args.output, args.opening_plies, args.max_plies,
+        args.move_time, args.move_nodes, args.game_time, args.seed, args.report_every)
@@ -0,0 +1,24 @@
+from players import Players
+
+piece_sprites = {
+    Players.BLACK: {
+        "pawn": "pieces/black_pawn.gif",
+        "rook": "pieces/black_rook.gif",
+        "knight": "pieces/black_knight.gif",
+        "bishop": "pieces/black_bishop.gif",
+        "queen": "pieces/black_queen.gif",
+        "king": "pieces/black_king.gif",
+    },
+
+    Players.WHITE: {
+        "pawn": "pieces/white_pawn.gif",
+        "rook": "pieces/white_rook.gif",
+        "knight": "pieces/white_knight.gif",
+        "bishop": "pieces/white_bishop.gif",
+        "queen": "pieces/white_queen.gif",
+        "king": "pieces/white_king.gif",
+    },
+}
+
+def sprite(piece):
+    return piece_sprites[piece.piece_color][piece.name]
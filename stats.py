@@ -0,0 +1,98 @@
+import json
+import time
+from notation import move_name
+
+# methods whose cumulative time is charged to each part of the search when it is profiled,
+# evaluation goes through the search so the pawn structure and batched leaves are counted with it
+phases = {
+    "generation": ("get_pseudo_legal_captures", "get_pseudo_legal_quiets", "is_pseudo_legal"),
+    "legality": ("in_check",),
+    "evaluation": ("evaluate", "collect_leaves"),
+}
+
+def ratio(part, whole):
+    if part is None or whole is None:
+        return None
+    return part / whole if whole else 0.0
+
+def rounded(value, digits):
+    return None if value is None else round(value, digits)
+
+def phase_times(profile):
+    # pstats is only loaded for profiled searches so the engine starts without it
+    import pstats
+    times = dict.fromkeys(phases, 0.0)
+    for (_, _, name), (_, _, _, cumulative, _) in pstats.Stats(profile).stats.items():
+        for phase, names in phases.items():
+            if name in names:
+                times[phase] += cumulative
+    return times
+
+class SearchStats:
+    def __init__(self, search, move, score, elapsed, table_probes=None, table_hits=None, pawn_probes=None, pawn_hits=None, profile=None):
+        self.move = move
+        self.score = score
+        self.elapsed = elapsed
+        self.depth = search.completed_depth
+        self.nodes = search.nodes
+        self.depth_nodes = list(search.depth_nodes)
+        # parallel searches only report their node counts back from the workers, the rest is left as None
+        self.quiescence_nodes = getattr(search, "quiescence_nodes", None)
+        self.evaluations = getattr(search, "evaluations", None)
+        self.tablebase_hits = getattr(search, "tablebase_hits", None)
+        self.cutoffs = getattr(search, "cutoffs", None)
+        self.first_move_cutoffs = getattr(search, "first_move_cutoffs", None)
+        self.table_probes = table_probes
+        self.table_hits = table_hits
+        self.pawn_probes = pawn_probes
+        self.pawn_hits = pawn_hits
+        self.profile = profile
+        self.time_split = phase_times(profile) if profile is not None else None
+
+    def nodes_per_second(self):
+        return ratio(self.nodes, self.elapsed)
+
+    def branching_factor(self):
+        # nodes the last iteration searched over those the one before it searched
+        iterations = [nodes - previous for previous, nodes in zip([0] + self.depth_nodes, self.depth_nodes)]
+        return ratio(iterations[-1], iterations[-2]) if len(iterations) > 1 else 0.0
+
+    def table_hit_rate(self):
+        return ratio(self.table_hits, self.table_probes)
+
+    def pawn_hit_rate(self):
+        return ratio(self.pawn_hits, self.pawn_probes)
+
+    def first_move_cutoff_rate(self):
+        return ratio(self.first_move_cutoffs, self.cutoffs)
+
+    def print_profile(self, limit=20, sort="cumulative"):
+        if self.profile is not None:
+            import pstats
+            pstats.Stats(self.profile).sort_stats(sort).print_stats(limit)
+
+    def as_dict(self):
+        record = {
+            "move": None if self.move is None else move_name(self.move),
+            "score": self.score,
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "quiescence_nodes": self.quiescence_nodes,
+            "evaluations": self.evaluations,
+            "time": round(self.elapsed, 4),
+            "nps": round(self.nodes_per_second()),
+            "branching_factor": round(self.branching_factor(), 2),
+            "table_hit_rate": rounded(self.table_hit_rate(), 4),
+            "pawn_hit_rate": rounded(self.pawn_hit_rate(), 4),
+            "tablebase_hits": self.tablebase_hits,
+            "first_move_cutoff_rate": rounded(self.first_move_cutoff_rate(), 4),
+        }
+        if self.time_split is not None:
+            record["time_split"] = {phase: round(seconds, 4) for phase, seconds in self.time_split.items()}
+        return record
+
+    def write(self, path, **fields):
+        # one record per line, extra fields such as a release tag are stored alongside
+        record = {"timestamp": round(time.time(), 3), **fields, **self.as_dict()}
+        with open(path, "a") as output:
+            output.write(json.dumps(record, separators=(",", ":")) + "\n")
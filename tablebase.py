@@ -0,0 +1,325 @@
+import argparse
+import os
+import time
+import zlib
+from bitboard import BitBoard, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, color_index
+from bitboard import knight_attacks, king_attacks, pawn_attacks, rook_rays, bishop_rays, slider_attacks
+
+letters = "PNBRQK"
+max_pieces = 4
+table_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+# a stored byte is 0 for draws and illegal positions, otherwise one more than the plies to mate,
+# an odd number of plies means the side to move delivers the mate
+illegal = 255
+max_plies = 253
+
+def attacks(piece_type, color, square, occupied):
+    if piece_type == PAWN:
+        return pawn_attacks[color][square]
+    if piece_type == KNIGHT:
+        return knight_attacks[square]
+    if piece_type == BISHOP:
+        return slider_attacks(square, occupied, bishop_rays)
+    if piece_type == ROOK:
+        return slider_attacks(square, occupied, rook_rays)
+    if piece_type == QUEEN:
+        return slider_attacks(square, occupied, rook_rays) | slider_attacks(square, occupied, bishop_rays)
+    return king_attacks[square]
+
+def side_strength(side):
+    return len(side), sorted((letters.index(letter) for letter in side), reverse=True)
+
+def signature_of(pieces):
+    return "v".join("".join(letters[piece_type] for color, piece_type, _ in pieces if color == side) for side in (WHITE, BLACK))
+
+def canonical(pieces, turn):
+    # kings first, then by falling piece value, with the stronger side playing white
+    pieces = sorted(pieces, key=lambda piece: (piece[0], -piece[1]))
+    white, black = signature_of(pieces).split("v")
+    if side_strength(white) < side_strength(black):
+        pieces = sorted(((1-color, piece_type, square ^ 56) for color, piece_type, square in pieces), key=lambda piece: (piece[0], -piece[1]))
+        turn = 1 - turn
+    return signature_of(pieces), [square for _, _, square in pieces], turn
+
+def signature_pieces(signature):
+    white, black = signature.upper().split("V")
+    pieces = [(WHITE, letters.index(letter), 0) for letter in white] + [(BLACK, letters.index(letter), 0) for letter in black]
+    signature = canonical(pieces, WHITE)[0]
+    white, black = signature.split("v")
+    return signature, [WHITE]*len(white) + [BLACK]*len(black), [letters.index(letter) for letter in white + black]
+
+def table_size(count):
+    return 2 * 32 * 64**(count-1)
+
+def position_index(squares, turn):
+    # the white king is mirrored onto files a-d, which holds with pawns since castling never applies
+    if squares[0] & 7 > 3:
+        squares = [square ^ 7 for square in squares]
+    index = turn*32 + (squares[0] >> 3)*4 + (squares[0] & 3)
+    for square in squares[1:]:
+        index = index*64 + square
+    return index
+
+def position_squares(index, count):
+    squares = []
+    for _ in range(count-1):
+        squares.append(index & 63)
+        index >>= 6
+    king = index & 31
+    squares.append((king >> 2)*8 + (king & 3))
+    squares.reverse()
+    return squares, index >> 5
+
+def outcome(value):
+    if value == 0:
+        return 0, 0
+    plies = value - 1
+    return (1 if plies % 2 else -1), plies
+
+def king_safe(colors, types, squares, color, captured=None):
+    occupied = 0
+    for index, square in enumerate(squares):
+        if index != captured:
+            occupied |= 1 << square
+    king = squares[colors.index(color)]
+    for index, square in enumerate(squares):
+        if index != captured and colors[index] != color and attacks(types[index], colors[index], square, occupied) >> king & 1:
+            return False
+    return True
+
+def piece_moves(colors, types, squares, turn):
+    occupied, own = 0, 0
+    for index, square in enumerate(squares):
+        occupied |= 1 << square
+        if colors[index] == turn:
+            own |= 1 << square
+    for index, square in enumerate(squares):
+        if colors[index] != turn:
+            continue
+        piece_type = types[index]
+        if piece_type == PAWN:
+            forward = -8 if turn == WHITE else 8
+            targets = pawn_attacks[turn][square] & occupied & ~own
+            one_step = square + forward
+            if not occupied >> one_step & 1:
+                targets |= 1 << one_step
+                if square >> 3 == (6 if turn == WHITE else 1) and not occupied >> (one_step+forward) & 1:
+                    targets |= 1 << (one_step+forward)
+        else:
+            targets = attacks(piece_type, turn, square, occupied) & ~own
+        while targets:
+            target_bit = targets & -targets
+            targets ^= target_bit
+            target = target_bit.bit_length() - 1
+            captured = squares.index(target) if occupied & target_bit else None
+            new_squares = list(squares)
+            new_squares[index] = target
+            if piece_type == PAWN and target >> 3 in (0, 7):
+                for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    yield new_squares, index, captured, promotion
+            else:
+                yield new_squares, index, captured, None
+
+def piece_unmoves(colors, types, squares, turn):
+    mover = 1 - turn
+    occupied = 0
+    for square in squares:
+        occupied |= 1 << square
+    for index, square in enumerate(squares):
+        if colors[index] != mover:
+            continue
+        if types[index] == PAWN:
+            back = 8 if mover == WHITE else -8
+            origin = square + back
+            origins = 0
+            if 8 <= origin < 56 and not occupied >> origin & 1:
+                origins |= 1 << origin
+                if (origin+back) >> 3 == (6 if mover == WHITE else 1) and not occupied >> (origin+back) & 1:
+                    origins |= 1 << (origin+back)
+        else:
+            origins = attacks(types[index], mover, square, occupied) & ~occupied
+        while origins:
+            origin_bit = origins & -origins
+            origins ^= origin_bit
+            new_squares = list(squares)
+            new_squares[index] = origin_bit.bit_length() - 1
+            yield new_squares
+
+def child_signatures(colors, types):
+    children = set()
+    for index, piece_type in enumerate(types):
+        if piece_type != KING:
+            pieces = [(colors[other], types[other], 0) for other in range(len(types)) if other != index]
+            children.add(canonical(pieces, WHITE)[0])
+        if piece_type == PAWN:
+            for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                pieces = [(colors[other], promotion if other == index else types[other], 0) for other in range(len(types))]
+                children.add(canonical(pieces, WHITE)[0])
+    return children
+
+def board_pieces(board):
+    if isinstance(board, BitBoard):
+        occupied = board.occupied[0] | board.occupied[1]
+        if occupied.bit_count() > max_pieces or board.castling_rooks or board.en_passant is not None:
+            return None
+        pieces = []
+        while occupied:
+            lowest = occupied & -occupied
+            occupied ^= lowest
+            square = lowest.bit_length() - 1
+            code = board.squares[square]
+            pieces.append((code // 6, code % 6, square))
+        return pieces
+    if sum(len(squares) for by_type in board.piece_squares.values() for squares in by_type) > max_pieces:
+        return None
+    if board.castling_rights() or board.en_passant_col() is not None:
+        return None
+    return [(color_index[color], piece_type, row*8 + col)
+        for color, by_type in board.piece_squares.items() for piece_type, squares in enumerate(by_type) for row, col in squares]
+
+class Tablebases:
+    def __init__(self, directory=table_directory):
+        self.directory = directory
+        self.tables = {}
+
+    def table(self, signature):
+        if signature not in self.tables:
+            path = os.path.join(self.directory, signature + ".tb")
+            if os.path.exists(path):
+                with open(path, "rb") as table:
+                    self.tables[signature] = zlib.decompress(table.read())
+            else:
+                self.tables[signature] = None
+        return self.tables[signature]
+
+    def lookup(self, pieces, turn):
+        signature, squares, turn = canonical(pieces, turn)
+        table = self.table(signature)
+        return None if table is None else table[position_index(squares, turn)]
+
+    def probe(self, board):
+        pieces = board_pieces(board)
+        if pieces is None:
+            return None
+        value = self.lookup(pieces, color_index[board.turn])
+        return None if value is None else outcome(value)
+
+    def best_move(self, board):
+        if self.probe(board) is None:
+            return None
+        best_move, best_key = None, None
+        for move in board.get_all_valid_moves():
+            undo = board.make_move(move)
+            board.change_turns()
+            try:
+                result = self.probe(board)
+            finally:
+                board.change_turns()
+                board.unmake_move(undo)
+            if result is None:
+                return None
+            sign, plies = result
+            # the quickest win, then any draw, then the slowest loss
+            key = (-sign, -plies if sign < 0 else plies if sign > 0 else 0)
+            if best_key is None or key > best_key:
+                best_move, best_key = move, key
+        return best_move
+
+def generate(signature, directory=table_directory, tablebases=None):
+    signature, colors, types = signature_pieces(signature)
+    if len(types) > max_pieces:
+        raise ValueError(f"{signature} has more than {max_pieces} pieces")
+    tablebases = tablebases if tablebases is not None else Tablebases(directory)
+    for child in sorted(child_signatures(colors, types)):
+        if tablebases.table(child) is None:
+            generate(child, directory, tablebases)
+
+    start = time.perf_counter()
+    count = len(types)
+    size = table_size(count)
+    values = bytearray(size)
+    moves_left = bytearray(size)
+    # positions resolved through moves that leave this table, keyed by the ply they resolve at
+    pending = {}
+    lost = []
+    for index in range(size):
+        squares, turn = position_squares(index, count)
+        if len(set(squares)) < count or any(types[piece] == PAWN and squares[piece] >> 3 in (0, 7) for piece in range(count)):
+            values[index] = illegal
+            continue
+        if not king_safe(colors, types, squares, 1-turn):
+            values[index] = illegal
+            continue
+        moves, drawn = 0, False
+        for new_squares, mover, captured, promotion in piece_moves(colors, types, squares, turn):
+            if not king_safe(colors, types, new_squares, turn, captured):
+                continue
+            moves += 1
+            if captured is None and promotion is None:
+                continue
+            pieces = [(colors[piece], promotion if piece == mover and promotion is not None else types[piece], new_squares[piece])
+                for piece in range(count) if piece != captured]
+            sign, plies = outcome(tablebases.lookup(pieces, 1-turn))
+            if sign == 0:
+                drawn = True
+            else:
+                pending.setdefault(plies+1, []).append((index, sign < 0))
+        if moves == 0:
+            if not king_safe(colors, types, squares, turn):
+                values[index] = 1
+                lost.append(index)
+            continue
+        # a move into a drawn table position can never be refuted
+        moves_left[index] = moves + drawn
+
+    level, current = 0, lost
+    while current or pending:
+        resolved = []
+        for index in current:
+            squares, turn = position_squares(index, count)
+            for previous in piece_unmoves(colors, types, squares, turn):
+                previous_index = position_index(previous, 1-turn)
+                if values[previous_index]:
+                    continue
+                if level % 2 == 0:
+                    values[previous_index] = level + 2
+                    resolved.append(previous_index)
+                else:
+                    moves_left[previous_index] -= 1
+                    if moves_left[previous_index] == 0:
+                        values[previous_index] = level + 2
+                        resolved.append(previous_index)
+        level += 1
+        for index, wins in pending.pop(level, []):
+            if values[index]:
+                continue
+            if wins:
+                values[index] = level + 1
+                resolved.append(index)
+            else:
+                moves_left[index] -= 1
+                if moves_left[index] == 0:
+                    values[index] = level + 1
+                    resolved.append(index)
+        current = resolved
+        if current and level > max_plies:
+            raise ValueError(f"{signature} has mates longer than {max_plies} plies")
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, signature + ".tb")
+    with open(path + ".tmp", "wb") as table:
+        table.write(zlib.compress(bytes(values.translate(bytes(range(255)) + b"\0")), 9))
+    os.replace(path + ".tmp", path)
+    tablebases.tables.pop(signature, None)
+    wins = sum(1 for value in values if value != illegal and value % 2 == 0 and value)
+    print(f"{signature}: {size} positions, {wins} wins for the side to move, {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("signatures", nargs="*", default=["KQvK", "KRvK", "KBvK", "KNvK", "KPvK"])
+    parser.add_argument("--directory", default=table_directory)
+    args = parser.parse_args()
+    tablebases = Tablebases(args.directory)
+    for signature in args.signatures:
+        if tablebases.table(signature_pieces(signature)[0]) is None:
+            generate(signature, args.directory, tablebases)
@@ -0,0 +1,55 @@
+from array import array
+
+EXACT, LOWER, UPPER = 0, 1, 2
+promotions = [None, "queen", "rook", "bishop", "knight"]
+# each slot is a 64-bit key plus one packed 64-bit word
+entry_size = 16
+
+def encode_move(move):
+    if move is None:
+        return 0
+    promotion = promotions.index(move[4]) if len(move) > 4 else 0
+    return (move[0]*8 + move[1]) | (move[2]*8 + move[3]) << 6 | promotion << 12
+
+def decode_move(code):
+    if code == 0:
+        return None
+    start, target, promotion = code & 63, code >> 6 & 63, code >> 12
+    move = (start // 8, start % 8, target // 8, target % 8)
+    return move + (promotions[promotion],) if promotion else move
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        self.size = max(1, int(size_mb * 1024 * 1024) // entry_size)
+        self.keys = array("Q", [0]) * self.size
+        self.data = array("q", [0]) * self.size
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        self.age = (self.age + 1) & 255
+
+    def clear(self):
+        self.keys = array("Q", [0]) * self.size
+        self.data = array("q", [0]) * self.size
+        self.age = 0
+
+    def probe(self, key):
+        self.probes += 1
+        index = key % self.size
+        if self.keys[index] != key:
+            return None
+        self.hits += 1
+        data = self.data[index]
+        return data >> 16 & 255, data >> 34, data >> 24 & 3, decode_move(data & 0xFFFF)
+
+    def store(self, key, depth, score, bound, move):
+        index = key % self.size
+        stored_key = self.keys[index]
+        if stored_key != 0 and stored_key != key:
+            data = self.data[index]
+            if data >> 26 & 255 == self.age and data >> 16 & 255 > depth:
+                return
+        self.keys[index] = key
+        self.data[index] = score << 34 | self.age << 26 | bound << 24 | min(depth, 255) << 16 | encode_move(move)
@@ -0,0 +1,185 @@
+import sys
+import threading
+import time
+from board import Board
+from bitboard import BitBoard
+from notation import uci_name, parse_uci
+from opponent import Opponent, mate_score, mate_threshold
+from players import Players
+
+options = {"Hash": (16, 1, 4096), "Threads": (1, 1, 64)}
+go_limits = ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes")
+default_moves_to_go = 30
+move_overhead = 0.05
+
+def score_text(score):
+    if score > mate_threshold:
+        return f"mate {(mate_score - score + 1) // 2}"
+    if score < -mate_threshold:
+        return f"mate {-((mate_score + score) // 2)}"
+    return f"cp {score}"
+
+def pv_names(board, pv):
+    board = BitBoard.unpack(board.pack())
+    names = []
+    for move in pv:
+        if move not in board.get_all_valid_moves():
+            break
+        names.append(uci_name(board, move))
+        board.make_move(move)
+        board.change_turns()
+    return names
+
+def time_budget(limits, turn):
+    if "movetime" in limits:
+        return limits["movetime"] / 1000
+    white = turn == Players.WHITE
+    remaining = limits.get("wtime" if white else "btime")
+    if remaining is None:
+        return None
+    increment = limits.get("winc" if white else "binc", 0)
+    budget = remaining / limits.get("movestogo", default_moves_to_go) + increment * 0.8
+    return max(0.01, min(budget, remaining - move_overhead*1000) / 1000)
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.lock = threading.Lock()
+        self.settings = {name: default for name, (default, _, _) in options.items()}
+        self.opponent = None
+        self.board = BitBoard()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def send(self, line):
+        with self.lock:
+            print(line, file=self.output, flush=True)
+
+    def engine(self):
+        if self.opponent is None:
+            self.opponent = Opponent(depth=None, hash_size=self.settings["Hash"], workers=self.settings["Threads"])
+        return self.opponent
+
+    def handle(self, line):
+        # a malformed command is reported to the gui and skipped, the engine keeps reading
+        try:
+            return self.dispatch(line)
+        except (ValueError, KeyError, IndexError) as error:
+            self.send(f"info string could not handle {line.strip()!r}: {error!r}")
+            return True
+
+    def dispatch(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name algorithmic_chess_bot")
+            self.send("id author hasorez")
+            for name, (default, low, high) in options.items():
+                self.send(f"option name {name} type spin default {default} min {low} max {high}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(arguments)
+        elif command == "ucinewgame":
+            self.stop()
+            if self.opponent is not None:
+                self.opponent.table.clear()
+        elif command == "position":
+            self.stop()
+            self.set_position(arguments)
+        elif command == "go":
+            self.go(arguments)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            return False
+        return True
+
+    def set_option(self, arguments):
+        if "name" not in arguments or "value" not in arguments:
+            return
+        name = " ".join(arguments[arguments.index("name")+1:arguments.index("value")])
+        if name not in options:
+            return
+        _, low, high = options[name]
+        self.stop()
+        self.settings[name] = max(low, min(high, int(arguments[arguments.index("value")+1])))
+        self.close()
+
+    def set_position(self, arguments):
+        moves_index = arguments.index("moves") if "moves" in arguments else len(arguments)
+        if arguments and arguments[0] == "fen":
+            board = BitBoard.from_board(Board(fen=" ".join(arguments[1:moves_index])))
+        else:
+            board = BitBoard()
+        for name in arguments[moves_index+1:]:
+            move = parse_uci(board, name)
+            if move not in board.get_all_valid_moves():
+                self.send(f"info string illegal move {name}")
+                break
+            board.make_move(move)
+            board.change_turns()
+        self.board = board
+
+    def go(self, arguments):
+        self.stop()
+        limits = {}
+        for index, token in enumerate(arguments[:-1]):
+            if token in go_limits:
+                limits[token] = int(arguments[index+1])
+        infinite = "infinite" in arguments
+        depth = limits.get("depth", 0)
+        time_limit = None if infinite else time_budget(limits, self.board.turn)
+        node_limit = limits.get("nodes")
+        self.stop_event = threading.Event()
+        board = BitBoard.unpack(self.board.pack())
+        self.thread = threading.Thread(target=self.think, args=(board, depth, time_limit, node_limit), daemon=True)
+        self.thread.start()
+
+    def think(self, board, depth, time_limit, node_limit):
+        started = time.perf_counter()
+
+        def report(depth, score, pv, nodes):
+            elapsed = max(time.perf_counter() - started, 1e-6)
+            self.send(f"info depth {depth} score {score_text(score)} nodes {nodes} nps {int(nodes/elapsed)} "
+                f"time {int(elapsed*1000)} pv {' '.join(pv_names(board, pv))}")
+
+        opponent = self.engine()
+        move = opponent.instant_move(board)
+        pv = [move]
+        if move is None:
+            search = opponent.search(board, depth, time_limit, node_limit, self.stop_event, report)
+            move, _, pv = search.iterative_deepening()
+        if move is None:
+            self.send("bestmove 0000")
+            return
+        names = pv_names(board, pv)
+        self.send(f"bestmove {names[0]}" + (f" ponder {names[1]}" if len(names) > 1 else ""))
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        if self.opponent is not None:
+            self.opponent.close()
+            self.opponent = None
+
+def main(lines=None):
+    # worker processes close sys.stdin when they fork, which blocks while it is being read from
+    if lines is None:
+        lines = open(sys.stdin.fileno(), closefd=False)
+    engine = UciEngine()
+    for line in lines:
+        if not engine.handle(line):
+            break
+    engine.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import random
+
+# a fixed seed keeps hashes identical across processes and runs
+randomizer = random.Random(0x5EED)
+
+piece_keys = [[randomizer.getrandbits(64) for _ in range(64)] for _ in range(12)]
+black_to_move = randomizer.getrandbits(64)
+en_passant_keys = [randomizer.getrandbits(64) for _ in range(8)]
+
+castling_squares = (0, 7, 56, 63)
+castling_square_keys = [randomizer.getrandbits(64) for _ in castling_squares]
+castling_keys = {}
+for subset in range(16):
+    mask, key = 0, 0
+    for index, square in enumerate(castling_squares):
+        if subset >> index & 1:
+            mask |= 1 << square
+            key ^= castling_square_keys[index]
+    castling_keys[mask] = key
+
+def en_passant_key(col):
+    return 0 if col is None else en_passant_keys[col]
+
+def position_hash(pieces, black, castling_rooks, en_passant_col):
+    key = 0
+    for square, code in pieces:
+        key ^= piece_keys[code][square]
+    if black:
+        key ^= black_to_move
+    return key ^ castling_keys[castling_rooks] ^ en_passant_key(en_passant_col)